@@ -0,0 +1,440 @@
+"""Benchmark do tabela_bi: gera CSVs sintéticos e mede cada etapa sem interface.
+
+Uso:
+    python benchmark_bi.py                              # 10k, 1M e 10M linhas
+    python benchmark_bi.py --tamanhos 10k,1M --salvar-baseline
+    python benchmark_bi.py --gerar exemplo.csv --linhas 50000
+
+Cada tamanho roda num processo próprio (memória limpa), e o pico de memória
+é medido por etapa. Com um baseline salvo, uma etapa mais lenta ou que usa mais
+memória que o limite permitido é uma regressão e o comando sai com código 1.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import matplotlib
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+import tabela_bi
+from tabela_bi import PowerBIInterativo
+
+PASTA_PADRAO = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.benchmark')
+BASELINE_PADRAO = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_baseline.json')
+TAMANHOS_PADRAO = '10k,1M,10M'
+# Diferença de pico (MB) abaixo da qual não há regressão de memória, qualquer que seja a porcentagem
+FOLGA_MEMORIA_MB = 8
+
+# ==========================================================
+# 🧪 Gerador de CSV sintético (determinístico pela semente)
+# ==========================================================
+UFS = ['SP', 'RJ', 'MG', 'RS', 'PR', 'SC', 'BA', 'PE', 'CE', 'GO', 'DF', 'ES', 'PA', 'AM', 'MT', 'MS']
+NOMES = ['Comércio', 'Distribuidora', 'Indústria', 'Farmácia', 'Supermercado', 'Construtora', 'Açougue',
+         'Padaria', 'Logística', 'Educação', 'Saúde', 'Turismo', 'Agropecuária', 'Importadora']
+COMPLEMENTOS = ['São João', 'Paraná', 'Brasília', 'Itaú', 'Goiânia', 'Maranhão', 'Ceará', 'Petrópolis',
+                'Niterói', 'Florianópolis', 'Uberlândia', 'Vitória']
+CAMPANHAS = ['Verão', 'Inverno', 'Black Friday', 'Natal', 'Volta às Aulas', 'Páscoa', 'Dia das Mães',
+             'Dia dos Pais', 'Institucional', 'Lançamento']
+FORMATOS_CNPJ = ('pontuado', 'digitos', 'misto')
+CABECALHO = ['Data Emissão', 'Total Líquido', 'Cliente', 'Campanha', 'Estado Cliente', 'CNPJ Cliente',
+             'PI', 'Veículo', 'Observação']
+
+
+def _cnpj_pontuado(digitos):
+    return f"{digitos[:2]}.{digitos[2:5]}.{digitos[5:8]}/{digitos[8:12]}-{digitos[12:]}"
+
+
+def _valores_brl(centavos):
+    """Centavos em texto no formato "R$ 1.234,56" """
+    return [f"R$ {c // 100:,}".replace(',', '.') + f",{c % 100:02d}" for c in centavos.tolist()]
+
+
+def gerar_csv(caminho, linhas, clientes=2000, campanhas=40, formato_cnpj='pontuado', encoding='latin1',
+              semente=42, anos=(2019, 2024), bloco=500_000):
+    """Gravar um CSV como o exportado pelo sistema: ';', datas dd/mm/aaaa, valores "R$ 1.234,56".
+
+    Clientes seguem uma distribuição de Zipf (poucos grandes, muitos pequenos).
+    Alguns CNPJs começam com zero e alguns clientes não têm UF. Com
+    `formato_cnpj='misto'` cada linha sorteia pontuado ou só dígitos, e ~1% sai
+    sem CNPJ. A mesma semente gera sempre o mesmo arquivo.
+    """
+    if formato_cnpj not in FORMATOS_CNPJ:
+        raise ValueError(f"Formato de CNPJ inválido: {formato_cnpj} (use {', '.join(FORMATOS_CNPJ)})")
+    rng = np.random.default_rng(semente)
+
+    nomes = np.array([
+        f"{NOMES[i % len(NOMES)]} {COMPLEMENTOS[(i // len(NOMES)) % len(COMPLEMENTOS)]} {i + 1}"
+        for i in range(clientes)
+    ], dtype=object)
+    ufs = rng.choice(np.array(UFS + [''], dtype=object), size=clientes, p=[0.95 / len(UFS)] * len(UFS) + [0.05])
+    digitos = np.array([''.join(map(str, d)) for d in rng.integers(0, 10, size=(clientes, 14))], dtype=object)
+    pontuados = np.array([_cnpj_pontuado(d) for d in digitos], dtype=object)
+    pesos = 1.0 / np.arange(1, clientes + 1) ** 1.1
+    pesos /= pesos.sum()
+
+    nomes_campanha = np.array([
+        f"Campanha {CAMPANHAS[k % len(CAMPANHAS)]} {k // len(CAMPANHAS) + 1}" for k in range(campanhas)
+    ], dtype=object)
+    dias = pd.date_range(f"{anos[0]}-01-01", f"{anos[1]}-12-31", freq='D')
+    datas = np.array(dias.strftime('%d/%m/%Y'), dtype=object)
+    veiculos = np.array(['TV Aberta', 'Rádio', 'Jornal', 'Revista', 'Internet', 'Outdoor'], dtype=object)
+
+    with open(caminho, 'w', encoding=encoding, newline='') as f:
+        f.write(';'.join(CABECALHO) + '\n')
+        for inicio in range(0, linhas, bloco):
+            n = min(bloco, linhas - inicio)
+            cliente = rng.choice(clientes, size=n, p=pesos)
+            if formato_cnpj == 'pontuado':
+                cnpj = pontuados[cliente]
+            elif formato_cnpj == 'digitos':
+                cnpj = digitos[cliente]
+            else:
+                cnpj = np.where(rng.random(n) < 0.5, pontuados[cliente], digitos[cliente])
+                cnpj[rng.random(n) < 0.01] = ''
+            centavos = np.round(rng.lognormal(mean=10.5, sigma=1.2, size=n)).astype(np.int64)
+            bloco_df = pd.DataFrame({
+                'data': datas[rng.integers(0, len(datas), size=n)],
+                'total': _valores_brl(centavos),
+                'cliente': nomes[cliente],
+                'campanha': nomes_campanha[rng.integers(0, campanhas, size=n)],
+                'uf': ufs[cliente],
+                'cnpj': cnpj,
+                'pi': rng.integers(1, max(2, linhas // 3), size=n).astype(str),
+                'veiculo': veiculos[rng.integers(0, len(veiculos), size=n)],
+                'obs': '',
+            })
+            bloco_df.to_csv(f, sep=';', header=False, index=False, lineterminator='\n')
+    return caminho
+
+
+def _tamanho(texto):
+    """'10k' -> 10000, '1M' -> 1000000"""
+    texto = texto.strip()
+    mult = {'k': 1_000, 'm': 1_000_000}.get(texto[-1:].lower())
+    return int(float(texto[:-1]) * mult) if mult else int(texto)
+
+
+def _csv_do_tamanho(args, linhas):
+    """CSV sintético do tamanho pedido, reaproveitado entre execuções com os mesmos parâmetros"""
+    os.makedirs(args.pasta, exist_ok=True)
+    nome = (f"bi_{linhas}l_{args.clientes}c_{args.campanhas}k_{args.formato_cnpj}_"
+            f"{args.encoding}_s{args.semente}.csv")
+    caminho = os.path.join(args.pasta, nome)
+    if args.regerar or not os.path.exists(caminho):
+        inicio = time.perf_counter()
+        print(f"Gerando {caminho}...")
+        gerar_csv(caminho, linhas, clientes=args.clientes, campanhas=args.campanhas,
+                  formato_cnpj=args.formato_cnpj, encoding=args.encoding, semente=args.semente)
+        print(f"  {os.path.getsize(caminho) / 2**20:.1f} MB em {time.perf_counter() - inicio:.1f}s")
+    return caminho
+
+
+# ==========================================================
+# ⏱️ Medição das etapas (janela sem Tk, figura Agg)
+# ==========================================================
+class _Variavel:
+    def __init__(self, valor=''):
+        self.valor = valor
+
+    def get(self):
+        return self.valor
+
+    def set(self, valor):
+        self.valor = valor
+
+
+class JanelaSemTela(PowerBIInterativo):
+    """PowerBIInterativo sem Tk: figura Agg, filtros em variáveis simples e tudo síncrono"""
+
+    def __init__(self, top_clientes=PowerBIInterativo.TOP_CLIENTES_PADRAO, compacto=False):
+        tabela_bi.DadosBI.__init__(self, top_clientes=top_clientes, compacto=compacto)
+        self.trabalhador = None
+        self.clientes_tree = None
+        self.cnpj_filtered = False
+        self.last_cnpj_search = ""
+        self.cnpjs_encontrados = []
+        self._pagina_legenda = 0
+        self._geracao_visao = 0
+        self._calculo_pendente = None
+        self.mostrar_latencia = False
+        self._interacao_pendente = None
+        self._hover_agendado = None
+        self._hover_evento = None
+        self.ano_var = _Variavel('Todos')
+        self.campanha_var = _Variavel('Todas')
+        self.cnpj_var = _Variavel('')
+        self.stats_label = SimpleNamespace(config=lambda **kwargs: None)
+        self.fig = Figure(figsize=(14, 8))
+        self.ax = self.fig.add_subplot()
+        self.canvas = FigureCanvasAgg(self.fig)
+        self._conectar_eventos()
+
+    def _evento_no_ponto(self, indice, button):
+        x, y = self.ax.transData.transform(self._pontos_series.get_offsets()[indice])
+        return SimpleNamespace(inaxes=self.ax, x=x, y=y, button=button)
+
+    def clicar_ponto(self, indice):
+        """Simular o clique (em pixels) sobre a bolinha `indice` do scatter"""
+        self.on_point_click(self._evento_no_ponto(indice, 1))
+
+    def passar_mouse(self, indice):
+        """Simular o mouse parado sobre a bolinha `indice` (dica)"""
+        self._on_mover(self._evento_no_ponto(indice, None))
+
+
+def _memoria_status_mb(campo):
+    """Campo de /proc/self/status (VmRSS, VmHWM) em MB"""
+    with open('/proc/self/status') as f:
+        for linha in f:
+            if linha.startswith(campo + ':'):
+                return int(linha.split()[1]) / 2**10
+    raise OSError(f"{campo} ausente em /proc/self/status")
+
+
+def _pico_por_rss():
+    """Linux: zerar o pico de RSS (VmHWM) antes de cada etapa; fora dele, tracemalloc"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        _memoria_status_mb('VmHWM')
+        return True
+    except OSError:
+        return False
+
+
+def _zerar_pico(por_rss):
+    """Recomeçar a contagem do pico; devolve a memória em uso (MB) nesse momento"""
+    if por_rss:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return _memoria_status_mb('VmRSS')
+    tracemalloc.reset_peak()
+    return tracemalloc.get_traced_memory()[0] / 2**20
+
+
+def _pico_desde(por_rss, inicio):
+    """Pico de memória (MB) acima de `inicio` desde o último _zerar_pico: o quanto a etapa precisou a mais"""
+    pico = _memoria_status_mb('VmHWM') if por_rss else tracemalloc.get_traced_memory()[1] / 2**20
+    return max(0.0, pico - inicio)
+
+
+def _filtros_exemplo(janela):
+    """Combinações de filtro medidas: tudo, um ano, uma campanha e um trecho de CNPJ"""
+    filtros = [('Todos', 'Todas', '')]
+    if janela.available_years:
+        filtros.append((str(janela.available_years[len(janela.available_years) // 2]), 'Todas', ''))
+    if janela.available_campanhas:
+        filtros.append(('Todos', janela.available_campanhas[0], ''))
+    if janela.has_cnpj_data and janela.cnpj_label_map:
+        filtros.append(('Todos', 'Todas', next(iter(janela.cnpj_label_map))[:6]))
+    return filtros
+
+
+def medir_etapas(csv, top_clientes, compacto, repeticoes):
+    """Tempo (s) e pico de memória (MB) de cada etapa para um CSV; roda num processo próprio.
+
+    O pico é o de cada etapa, acima da memória em uso quando ela começou (não
+    o pico acumulado do processo). No Linux vem do RSS, que enxerga também o que o
+    pyarrow aloca fora do Python; nos demais sistemas, do tracemalloc.
+    """
+    por_rss = _pico_por_rss()
+    if not por_rss:
+        tracemalloc.start()
+
+    matplotlib.use('Agg')
+    janela = JanelaSemTela(top_clientes=top_clientes, compacto=compacto)
+    etapas = {}
+
+    def medir(nome, funcao, vezes=1, chamadas=1):
+        # Tempo por chamada: mediana das repetições dividida pelas chamadas de cada uma
+        tempos = []
+        em_uso = _zerar_pico(por_rss)
+        for _ in range(vezes):
+            inicio = time.perf_counter()
+            funcao()
+            tempos.append(time.perf_counter() - inicio)
+        etapas[nome] = {'segundos': statistics.median(tempos) / chamadas, 'pico_etapa_mb': _pico_desde(por_rss, em_uso)}
+
+    def ler():
+        janela.df, _ = janela._ler_e_preparar(csv)
+
+    medir('ler_e_preparar', ler)
+    medir('build_cliente_labels', janela.build_cliente_labels)
+    if compacto:
+        medir('compactar', lambda: setattr(janela, 'df', janela._compactar(janela.df)))
+    medir('montar_cubo', janela._atualizar_disponiveis)
+
+    filtros = _filtros_exemplo(janela)
+
+    def aplicar_filtros(acao):
+        def rodar():
+            for ano, campanha, cnpj in filtros:
+                janela.ano_var.set(ano)
+                janela.campanha_var.set(campanha)
+                janela.cnpj_var.set(cnpj)
+                acao()
+        return rodar
+
+    medir('filtrar_dados', aplicar_filtros(janela.filtrar_dados), repeticoes, len(filtros))
+
+    def sem_cache(acao):
+        def rodar():
+            janela._visoes.limpar()
+            acao()
+        return rodar
+
+    medir('update_plot', sem_cache(aplicar_filtros(janela.update_plot)), repeticoes, len(filtros))
+    # Voltar a filtros já vistos: as visões saem do cache e sobra só o desenho
+    medir('update_plot_repetido', aplicar_filtros(janela.update_plot), repeticoes, len(filtros))
+
+    # Cliques e redesenho sobre a visão sem filtros (a maior)
+    janela.ano_var.set('Todos')
+    janela.campanha_var.set('Todas')
+    janela.cnpj_var.set('')
+    janela.update_plot()
+    pontos = len(janela._serie_do_ponto) if janela._pontos_series is not None else 0
+    if pontos:
+        indices = np.linspace(0, pontos - 1, num=min(pontos, 10)).astype(int)
+        medir('on_point_click', lambda: [janela.clicar_ponto(i) for i in indices], repeticoes, len(indices))
+        medir('hover', lambda: [janela.passar_mouse(i) for i in indices], repeticoes, len(indices))
+    medir('redraw', janela.redraw, repeticoes)
+
+    return {
+        'linhas': len(janela.df),
+        'filtros': len(filtros),
+        'etapas': etapas,
+    }
+
+
+# ==========================================================
+# 📏 Comparação com o baseline
+# ==========================================================
+def comparar(resultados, baseline, limite, limite_memoria, folga_segundos):
+    """Regressões (texto) de tempo e memória em relação ao baseline.
+
+    Diferenças de tempo menores que `folga_segundos` e de memória menores que
+    FOLGA_MEMORIA_MB são ignoradas: em etapas pequenas o ruído passaria fácil de
+    qualquer porcentagem.
+    """
+    regressoes = []
+    for tamanho, medido in resultados.items():
+        referencia = baseline.get(tamanho)
+        if not referencia:
+            continue
+        for etapa, valores in medido['etapas'].items():
+            ref = referencia['etapas'].get(etapa)
+            if not ref:
+                continue
+            antes, agora = ref['segundos'], valores['segundos']
+            if agora > antes * (1 + limite) and agora - antes > folga_segundos:
+                regressoes.append(f"{tamanho} {etapa}: {antes:.3f}s -> {agora:.3f}s (+{agora / antes - 1:.0%})")
+            antes, agora = ref.get('pico_etapa_mb'), valores.get('pico_etapa_mb')
+            if antes and agora and agora > antes * (1 + limite_memoria) and agora - antes > FOLGA_MEMORIA_MB:
+                regressoes.append(f"{tamanho} {etapa}: pico {antes:.0f} MB -> {agora:.0f} MB (+{agora / antes - 1:.0%})")
+    return regressoes
+
+
+def _imprimir(tamanho, medido, referencia):
+    print(f"\n{tamanho} ({medido['linhas']:,} linhas; etapas interativas por chamada)")
+    print(f"  {'etapa':<22}{'tempo':>12}{'pico':>11}{'baseline':>13}")
+    for etapa, valores in medido['etapas'].items():
+        ref = (referencia or {}).get('etapas', {}).get(etapa)
+        base = f"{ref['segundos'] * 1000:.1f} ms" if ref else '-'
+        print(f"  {etapa:<22}{valores['segundos'] * 1000:>9.1f} ms{valores['pico_etapa_mb']:>8.0f} MB{base:>13}")
+
+
+def _ambiente():
+    return {
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'sistema': platform.platform(),
+        'processador': platform.processor() or platform.machine(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do tabela_bi com CSVs sintéticos")
+    parser.add_argument('--tamanhos', default=TAMANHOS_PADRAO, help=f"linhas por rodada (padrão: {TAMANHOS_PADRAO})")
+    parser.add_argument('--clientes', type=int, default=2000)
+    parser.add_argument('--campanhas', type=int, default=40)
+    parser.add_argument('--formato-cnpj', choices=FORMATOS_CNPJ, default='pontuado')
+    parser.add_argument('--encoding', choices=['latin1', 'utf-8'], default='latin1')
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--top-clientes', type=int, default=PowerBIInterativo.TOP_CLIENTES_PADRAO)
+    parser.add_argument('--compacto', action='store_true', help="medir com o modo compacto")
+    parser.add_argument('--repeticoes', type=int, default=3, help="repetições das etapas interativas (mediana)")
+    parser.add_argument('--pasta', default=PASTA_PADRAO, help="onde guardar os CSVs gerados")
+    parser.add_argument('--regerar', action='store_true', help="gerar os CSVs de novo mesmo se já existirem")
+    parser.add_argument('--baseline', default=BASELINE_PADRAO, help="JSON com os tempos de referência")
+    parser.add_argument('--salvar-baseline', action='store_true', help="gravar os resultados como novo baseline")
+    parser.add_argument('--limite', type=float, default=0.25, help="piora de tempo tolerada (padrão: 0.25 = 25%%)")
+    parser.add_argument('--limite-memoria', type=float, default=0.20, help="piora de pico de memória tolerada")
+    parser.add_argument('--folga', type=float, default=0.02, help="diferença mínima de tempo (s) para contar")
+    parser.add_argument('--saida', help="gravar os resultados desta execução neste JSON")
+    parser.add_argument('--gerar', metavar='CSV', help="só gerar um CSV sintético (com --linhas) e sair")
+    parser.add_argument('--linhas', default='10k', help="linhas do CSV de --gerar")
+    args = parser.parse_args()
+
+    if args.gerar:
+        gerar_csv(args.gerar, _tamanho(args.linhas), clientes=args.clientes, campanhas=args.campanhas,
+                  formato_cnpj=args.formato_cnpj, encoding=args.encoding, semente=args.semente)
+        print(f"CSV gerado: {args.gerar}")
+        return 0
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f).get('resultados', {})
+
+    parametros = {k: getattr(args, k) for k in ('clientes', 'campanhas', 'formato_cnpj', 'encoding',
+                                                 'semente', 'top_clientes', 'compacto')}
+    resultados = {}
+    for tamanho in [t.strip() for t in args.tamanhos.split(',') if t.strip()]:
+        csv = _csv_do_tamanho(args, _tamanho(tamanho))
+        # Um processo por tamanho: o pico de memória de um não contamina o do próximo
+        with ProcessPoolExecutor(max_workers=1) as pool:
+            resultados[tamanho] = pool.submit(
+                medir_etapas, csv, args.top_clientes, args.compacto, args.repeticoes
+            ).result()
+        resultados[tamanho]['parametros'] = parametros
+        _imprimir(tamanho, resultados[tamanho], baseline.get(tamanho))
+
+    documento = {'ambiente': _ambiente(), 'resultados': resultados}
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            json.dump(documento, f, ensure_ascii=False, indent=2)
+
+    diferentes = [t for t in resultados if t in baseline and baseline[t].get('parametros') != parametros]
+    if diferentes:
+        print(f"\nAviso: baseline de {', '.join(diferentes)} medido com outros parâmetros.")
+    regressoes = comparar(resultados, baseline, args.limite, args.limite_memoria, args.folga)
+
+    if args.salvar_baseline:
+        baseline.update(resultados)
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump({'ambiente': _ambiente(), 'resultados': baseline}, f, ensure_ascii=False, indent=2)
+        print(f"\nBaseline salvo em {args.baseline}")
+
+    if regressoes:
+        print("\nRegressões:")
+        for texto in regressoes:
+            print(f"  {texto}")
+        return 1
+    if baseline:
+        print("\nSem regressões em relação ao baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
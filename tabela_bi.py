@@ -1,6 +1,9 @@
 import pandas as pd
 import matplotlib.pyplot as plt
 import matplotlib.ticker as mticker
+from matplotlib.patches import Rectangle
+from matplotlib.collections import LineCollection
+from matplotlib.lines import Line2D
 import tkinter as tk
 from tkinter import ttk, messagebox
 import numpy as np
@@ -9,30 +12,451 @@ import warnings
 from datetime import datetime
 import os
 import sys
+import json
+import hashlib
+import argparse
+import queue
+import io
+import codecs
+import re
+import tempfile
+import unicodedata
+import glob
+import time
+import threading
+import functools
+import cProfile
+import tracemalloc
+from contextlib import contextmanager
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs, urlencode
+from urllib.request import urlopen
+from urllib.error import HTTPError
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
 
 warnings.filterwarnings('ignore', category=UserWarning)
 
-class PowerBIInterativo:
-    def __init__(self, root, source_file=None):
+# Versão do formato do cache em disco; incrementar sempre que a preparação dos
+# dados (colunas derivadas, tipos, rótulos) mudar, para invalidar caches antigos
+CACHE_SCHEMA_VERSION = 3
+
+class SelecaoCubo:
+    """Células do cubo escolhidas por posição (None = todas), sem copiar o cubo"""
+
+    def __init__(self, cubo, pos=None):
+        self.cubo = cubo
+        self.pos = pos
+
+    def __len__(self):
+        return len(self.cubo) if self.pos is None else len(self.pos)
+
+    @property
+    def empty(self):
+        return len(self) == 0
+
+    def valores(self, coluna):
+        arr = self.cubo[coluna].to_numpy()
+        return arr if self.pos is None else arr[self.pos]
+
+    def codigos(self, coluna):
+        # .array.codes é uma visão dos códigos; .cat.codes montaria uma Series copiada
+        arr = self.cubo[coluna].array.codes
+        return arr if self.pos is None else arr[self.pos]
+
+    def categorias(self, coluna):
+        return self.cubo[coluna].cat.categories
+
+
+class IndiceCnpj:
+    """Busca por trecho de CNPJ sobre os CNPJs distintos.
+
+    Índice invertido de trigramas: a consulta intersecta as listas dos
+    trigramas do trecho e só confirma (``in``) os candidatos que sobrarem.
+    Trechos com menos de 3 dígitos varrem a lista de CNPJs distintos.
+    """
+
+    N = 3
+
+    def __init__(self, cnpjs):
+        self.cnpjs = [c for c in cnpjs if c]
+        postings = {}
+        for i, cnpj in enumerate(self.cnpjs):
+            for gram in {cnpj[k:k + self.N] for k in range(len(cnpj) - self.N + 1)}:
+                postings.setdefault(gram, []).append(i)
+        self.postings = {gram: np.array(ids, dtype=np.int32) for gram, ids in postings.items()}
+
+    def buscar(self, trecho):
+        """CNPJs (dígitos) que contêm `trecho`, na ordem do índice"""
+        if not trecho:
+            return []
+        if len(trecho) < self.N:
+            return [c for c in self.cnpjs if trecho in c]
+
+        grams = {trecho[k:k + self.N] for k in range(len(trecho) - self.N + 1)}
+        listas = sorted((self.postings.get(g) for g in grams), key=lambda ids: -1 if ids is None else len(ids))
+        if listas[0] is None:
+            return []
+        candidatos = listas[0]
+        for ids in listas[1:]:
+            candidatos = np.intersect1d(candidatos, ids, assume_unique=True)
+            if not len(candidatos):
+                return []
+        return [self.cnpjs[i] for i in candidatos if trecho in self.cnpjs[i]]
+
+
+class IndicePontos:
+    """Grade uniforme sobre pontos em coordenadas de tela (pixels) para achar o mais próximo do mouse.
+
+    Cada ponto cai numa célula do tamanho do raio de toque; a consulta só
+    mede a distância dos pontos das 3x3 células em volta do cursor.
+    """
+
+    def __init__(self, xy, raio):
+        self.xy = np.asarray(xy, dtype=float)
+        self.raio = raio
+        celulas = np.floor(self.xy / raio).astype(np.int64)
+        chaves = self._chave(celulas[:, 0], celulas[:, 1])
+        self.ordem = np.argsort(chaves, kind='stable')
+        self.chaves = chaves[self.ordem]
+
+    @staticmethod
+    def _chave(cx, cy):
+        # Só pontos dentro dos eixos entram no índice, então as células são poucas e pequenas
+        return cx * (1 << 20) + cy
+
+    def mais_proximo(self, x, y):
+        """Índice do ponto mais próximo de (x, y) dentro do raio, ou None"""
+        cx, cy = int(np.floor(x / self.raio)), int(np.floor(y / self.raio))
+        vizinhas = np.array([self._chave(cx + dx, cy + dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1)])
+        inicio = np.searchsorted(self.chaves, vizinhas, side='left')
+        fim = np.searchsorted(self.chaves, vizinhas, side='right')
+        candidatos = np.concatenate([self.ordem[i:j] for i, j in zip(inicio, fim)])
+        if not len(candidatos):
+            return None
+        distancias = np.hypot(self.xy[candidatos, 0] - x, self.xy[candidatos, 1] - y)
+        melhor = np.argmin(distancias)
+        return int(candidatos[melhor]) if distancias[melhor] <= self.raio else None
+
+
+class MarcasPeriodo(mticker.Locator):
+    """Marcas do eixo de tempo (meses desde o ano 0) no centro dos períodos da granularidade atual.
+
+    O passo entre marcas é o menor múltiplo do período que deixa no máximo
+    `marcas_max` marcas na faixa visível; o rótulo segue a granularidade.
+    """
+    PASSOS_MESES = (1, 2, 3, 6, 12, 24, 60, 120, 240, 600)
+
+    def __init__(self, granularidade='mes', marcas_max=14):
+        self.granularidade = granularidade
+        self.marcas_max = marcas_max
+
+    def __call__(self):
+        vmin, vmax = self.axis.get_view_interval()
+        return self.tick_values(vmin, vmax)
+
+    def tick_values(self, vmin, vmax):
+        vmin, vmax = sorted((vmin, vmax))
+        meses = DadosBI.MESES_POR_PERIODO[self.granularidade]
+        centro = (meses - 1) / 2
+        passos = [p for p in self.PASSOS_MESES if p % meses == 0]
+        passo = next((p for p in passos if (vmax - vmin) / p <= self.marcas_max), passos[-1])
+        inicio = np.ceil((vmin - centro) / passo) * passo
+        return np.arange(inicio, vmax - centro + 1e-9, passo) + centro
+
+    def formatar(self, x, _pos=None):
+        return DadosBI.rotulo_periodo(x, self.granularidade)
+
+
+class CacheVisoes:
+    """LRU das visões já calculadas, limitado pela soma (aproximada) dos bytes guardados"""
+
+    def __init__(self, limite_bytes):
+        self.limite_bytes = limite_bytes
+        self.bytes = 0
+        self.acertos = 0
+        self.falhas = 0
+        self._itens = OrderedDict()
+        self._trava = threading.Lock()
+
+    def __len__(self):
+        return len(self._itens)
+
+    def obter(self, chave):
+        with self._trava:
+            item = self._itens.get(chave)
+            if item is None:
+                self.falhas += 1
+                return None
+            self._itens.move_to_end(chave)
+            self.acertos += 1
+            return item[0]
+
+    def guardar(self, chave, valor, tamanho):
+        if tamanho > self.limite_bytes:
+            return
+        with self._trava:
+            antigo = self._itens.pop(chave, None)
+            if antigo is not None:
+                self.bytes -= antigo[1]
+            self._itens[chave] = (valor, tamanho)
+            self.bytes += tamanho
+            while self.bytes > self.limite_bytes:
+                _, (_, removido) = self._itens.popitem(last=False)
+                self.bytes -= removido
+
+    def limpar(self):
+        with self._trava:
+            self._itens.clear()
+            self.bytes = 0
+
+
+class Trabalhador:
+    """Executa tarefas fora da thread do Tk e entrega os resultados nela.
+
+    Uma única thread de trabalho: carga, montagem do cubo e filtros rodam em
+    ordem, sem disputar os dados. Resultados, erros e avisos de progresso vão
+    para uma fila que a thread do Tk esvazia periodicamente com `root.after`.
+    """
+
+    INTERVALO_MS = 30
+
+    def __init__(self, root):
         self.root = root
-        self.root.title("Power BI em Python - Relatório Interativo")
-        self.root.geometry("1500x900")
-        self.source_file = source_file
-        self.cnpj_filtered = False
-        self.last_cnpj_search = ""
-        self.clientes_tree = None
-        
-        self.setup_styles()
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='tabela_bi')
+        self.fila = queue.Queue()
+        self.encerrado = False
+        self.root.after(self.INTERVALO_MS, self._despachar)
+
+    def submeter(self, tarefa, ao_concluir, ao_falhar=None):
+        """Rodar `tarefa()` em segundo plano; o Future permite cancelar enquanto estiver na fila"""
+        def rodar():
+            try:
+                resultado = tarefa()
+            except Exception as e:
+                self.fila.put((ao_falhar, e))
+                return
+            self.fila.put((ao_concluir, resultado))
+        return self.executor.submit(rodar)
+
+    def notificar(self, callback, valor):
+        """Chamar `callback(valor)` na thread do Tk (pode ser usado de qualquer thread)"""
+        self.fila.put((callback, valor))
+
+    def _despachar(self):
+        if self.encerrado:
+            return
         try:
-            if source_file:
-                self.process_csv_data(source_file)
-                self.setup_ui()
-            else:
-                messagebox.showerror("Erro", "Nenhum arquivo CSV informado.")
-                root.destroy()
-        except Exception as e:
-            messagebox.showerror("Erro", f"Erro ao carregar dados: {str(e)}")
-            root.destroy()
+            while True:
+                try:
+                    callback, valor = self.fila.get_nowait()
+                except queue.Empty:
+                    break
+                if callback is None:
+                    continue
+                try:
+                    callback(valor)
+                except Exception:
+                    # Um callback com erro não pode parar a entrega dos próximos resultados
+                    self.root.report_callback_exception(*sys.exc_info())
+        finally:
+            if not self.encerrado:
+                self.root.after(self.INTERVALO_MS, self._despachar)
+
+    def encerrar(self):
+        self.encerrado = True
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+class Medidor:
+    """Cronômetros nomeados por etapa, com variação de memória, registrados como JSON (uma linha por evento).
+
+    `log` é None (sem registro), '-' (stderr) ou um arquivo. Com `perfil`
+    (uma pasta), cada etapa de nível mais alto de uma thread grava também um
+    cProfile (.prof) e um snapshot do tracemalloc (.tracemalloc).
+    """
+
+    # Um só cProfile ativo por vez no processo (Python 3.12+ não aceita dois)
+    _trava_perfil = threading.Lock()
+
+    def __init__(self, log=None, perfil=None):
+        self.log = log
+        self.perfil = perfil
+        self._local = threading.local()
+        self._trava = threading.Lock()
+        self._saida = None
+        self._contador = 0
+        if perfil:
+            os.makedirs(perfil, exist_ok=True)
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+        self._memoria = self._leitor_memoria() if log else None
+
+    @classmethod
+    def do_ambiente(cls):
+        """Medidor configurado por TABELA_BI_LOG e TABELA_BI_PERFIL (também usados pelos processos do pool)"""
+        return cls(os.environ.get('TABELA_BI_LOG') or None, os.environ.get('TABELA_BI_PERFIL') or None)
+
+    @staticmethod
+    def _leitor_memoria():
+        """Função que devolve a memória atual do processo em bytes (ou None sem como medir)"""
+        if tracemalloc.is_tracing():
+            return lambda: tracemalloc.get_traced_memory()[0]
+        try:
+            import psutil
+            processo = psutil.Process()
+            return lambda: processo.memory_info().rss
+        except ImportError:
+            pass
+        if os.path.exists('/proc/self/statm'):
+            pagina = os.sysconf('SC_PAGE_SIZE')
+
+            def rss():
+                with open('/proc/self/statm') as f:
+                    return int(f.read().split()[1]) * pagina
+            return rss
+        return lambda: None
+
+    @contextmanager
+    def etapa(self, nome, **campos):
+        """Medir o bloco; o dicionário entregue recebe campos extras e, no fim, 'ms'"""
+        nivel = getattr(self._local, 'nivel', 0)
+        self._local.nivel = nivel + 1
+        perfil = self._iniciar_perfil() if self.perfil and nivel == 0 else None
+        memoria_antes = self._memoria() if self._memoria else None
+        registro = dict(campos)
+        inicio = time.perf_counter()
+        try:
+            yield registro
+        finally:
+            registro['ms'] = (time.perf_counter() - inicio) * 1000
+            self._local.nivel = nivel
+            if perfil is not None:
+                self._gravar_perfil(perfil, nome)
+            if self.log:
+                memoria = self._memoria()
+                if memoria is not None:
+                    registro['mem_mb'] = round(memoria / 2**20, 1)
+                    if memoria_antes is not None:
+                        registro['mem_delta_mb'] = round((memoria - memoria_antes) / 2**20, 1)
+                self.registrar('etapa', nome=nome, nivel=nivel, **{**registro, 'ms': round(registro['ms'], 2)})
+
+    def registrar(self, evento, **campos):
+        if not self.log:
+            return
+        linha = json.dumps({
+            'ts': datetime.now().isoformat(timespec='milliseconds'),
+            'evento': evento,
+            'pid': os.getpid(),
+            'thread': threading.current_thread().name,
+            **campos,
+        }, ensure_ascii=False, default=str)
+        with self._trava:
+            if self._saida is None:
+                self._saida = sys.stderr if self.log == '-' else open(self.log, 'a', encoding='utf-8', buffering=1)
+            self._saida.write(linha + '\n')
+
+    def _iniciar_perfil(self):
+        if not self._trava_perfil.acquire(blocking=False):
+            return None
+        perfil = cProfile.Profile()
+        try:
+            perfil.enable()
+        except ValueError:
+            # Outra ferramenta de profiling já ativa (um depurador, por exemplo)
+            self._trava_perfil.release()
+            return None
+        return perfil
+
+    def _gravar_perfil(self, perfil, nome):
+        perfil.disable()
+        self._trava_perfil.release()
+        with self._trava:
+            self._contador += 1
+            base = os.path.join(self.perfil, f"{os.getpid()}_{self._contador:04d}_{nome}")
+        perfil.dump_stats(base + '.prof')
+        tracemalloc.take_snapshot().dump(base + '.tracemalloc')
+        self.registrar('perfil', nome=nome, arquivo=base + '.prof', snapshot=base + '.tracemalloc')
+
+
+def medido(nome):
+    """Decorador de método: mede a chamada inteira como a etapa `nome` do medidor da instância"""
+    def decorar(metodo):
+        @functools.wraps(metodo)
+        def medir(self, *args, **kwargs):
+            with self.medidor.etapa(nome):
+                return metodo(self, *args, **kwargs)
+        return medir
+    return decorar
+
+
+class TrechoArquivo(io.RawIOBase):
+    """Arquivo binário lido só até `limite` bytes: o que for escrito depois fica para a próxima leitura.
+
+    Com `recodificar`, o trecho é decodificado nesse encoding em blocos, com
+    '\ufffd' no lugar dos bytes inválidos, e entregue em UTF-8 (para o leitor
+    pyarrow, que não aceita encoding_errors) sem guardar o arquivo na memória.
+    """
+    # Bytes lidos por vez do disco ao recodificar
+    BLOCO = 1024 * 1024
+
+    def __init__(self, file_path, limite, recodificar=None):
+        self._f = open(file_path, 'rb')
+        self._restam = limite
+        self._decodificador = codecs.getincrementaldecoder(recodificar)(errors='replace') if recodificar else None
+        self._pendente = b''
+        self._usado = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        if self._decodificador is None:
+            n = self._f.readinto(memoryview(b)[:self._restam]) if self._restam else 0
+            self._restam -= n
+            return n
+        while self._usado == len(self._pendente) and self._restam:
+            bloco = self._f.read(min(self.BLOCO, self._restam))
+            self._restam = self._restam - len(bloco) if bloco else 0
+            self._pendente = self._decodificador.decode(bloco, final=not self._restam).encode('utf-8')
+            self._usado = 0
+        n = min(len(b), len(self._pendente) - self._usado)
+        b[:n] = self._pendente[self._usado:self._usado + n]
+        self._usado += n
+        return n
+
+    def close(self):
+        self._f.close()
+        super().close()
+
+
+class DadosBI:
+    """Carga, preparação e consultas dos dados, sem interface (usado pelo Tk e pelo modo em lote)"""
+
+    COR_OUTROS = (0.55, 0.55, 0.55, 1.0)
+    # Acima disso os clientes menores são somados na série "Outros" (0 = plotar todos)
+    TOP_CLIENTES_PADRAO = 50
+    # Sem registro; cada instância troca pelo configurado no ambiente
+    medidor = Medidor()
+    # Intervalo (s) entre verificações de linhas novas no CSV; None = não observar
+    observar = None
+
+    def __init__(self, top_clientes=TOP_CLIENTES_PADRAO, compacto=False, relatorio_memoria=False):
+        # None/0 = todos os clientes; N = só os N maiores por valor, o resto vira "Outros"
+        self.top_clientes = top_clientes or None
+        # Modo compacto: lê só as colunas usadas e guarda texto repetido como categorias
+        self.compacto = compacto
+        self.relatorio_memoria = relatorio_memoria
+        self.ao_progresso = None
+        self.medidor = Medidor.do_ambiente()
+
+    def _etapa(self, texto):
+        """Avisar o progresso da carga (na interface, quando houver uma)"""
+        callback = getattr(self, 'ao_progresso', None)
+        if callback is not None:
+            callback(texto)
 
     @staticmethod
     def _only_digits(value):
@@ -44,44 +468,341 @@ class PowerBIInterativo:
             return f"{digits[:2]}.{digits[2:5]}.{digits[5:8]}/{digits[8:12]}-{digits[12:]}"
         return digits
 
+    @staticmethod
+    def _csv_engine():
+        """Leitor em C por padrão; pyarrow (multithread) quando estiver instalado"""
+        try:
+            import pyarrow  # noqa: F401
+            return 'pyarrow'
+        except ImportError:
+            return 'c'
+
+    @staticmethod
+    def _parse_valores(serie):
+        """Converter valores no formato brasileiro ("R$ 1.234,56") em float.
+
+        As operações de string são feitas em bloco; a busca por regex só roda
+        nas linhas que não viraram número na conversão direta.
+        """
+        texto = (
+            serie.str.strip()
+            .str.replace('r$', '', regex=False)
+            .str.replace(' ', '', regex=False)
+            .str.replace('.', '', regex=False)
+            .str.replace(',', '.', regex=False)
+        )
+        # "R$1234.56" (maiúsculo) não é removido acima; quando o resto é um número
+        # simples o resultado é o mesmo do regex, então converte direto
+        com_simbolo = texto.str.startswith('R$', na=False)
+        sem_simbolo = texto.where(~com_simbolo, texto.str.slice(2))
+        numero_simples = sem_simbolo.str.fullmatch(r'[-+]?\d+(?:\.\d+)?', na=False)
+        valores = pd.to_numeric(sem_simbolo.where(~com_simbolo | numero_simples), errors='coerce')
+
+        falhas = valores.isna() & texto.notna()
+        if falhas.any():
+            extraido = texto[falhas].str.extract(r'([-+]?\d+(?:\.\d+)?)', expand=False)
+            valores[falhas] = pd.to_numeric(extraido, errors='coerce')
+
+        return valores.fillna(0.0).astype(float)
+
+    # Formatos de data aceitos, tentados na ordem de acerto numa amostra
+    FORMATOS_DATA = ['%d/%m/%Y', '%d/%m/%Y %H:%M:%S', '%d/%m/%Y %H:%M', '%d/%m/%y', '%d-%m-%Y',
+                     '%d.%m.%Y', '%Y-%m-%d', '%Y-%m-%d %H:%M:%S', '%Y-%m-%dT%H:%M:%S']
+    AMOSTRA_DATAS = 1000
+
+    @classmethod
+    def _converter_datas(cls, serie):
+        """Converter datas em texto convertendo cada texto distinto uma única vez.
+
+        Os formatos explícitos são tentados na ordem de acerto numa amostra dos
+        textos; o que nenhum reconhecer ainda passa pela inferência do pandas
+        (dia primeiro). Devolve as datas (NaT onde falhou) e a contagem das falhas.
+        """
+        texto = serie.str.strip()
+        codigos, distintos = pd.factorize(texto)
+        distintos = pd.Series(distintos, dtype=object)
+        amostra = distintos.iloc[:cls.AMOSTRA_DATAS]
+        acertos = {
+            formato: pd.to_datetime(amostra, format=formato, errors='coerce').notna().sum()
+            for formato in cls.FORMATOS_DATA
+        }
+        formatos = [f for f in sorted(cls.FORMATOS_DATA, key=lambda f: -acertos[f]) if acertos[f]]
+
+        # Última posição = NaT, para os textos vazios (código -1 do factorize)
+        convertidas = np.full(len(distintos) + 1, np.datetime64('NaT'), dtype='datetime64[ns]')
+        faltam = distintos.index.to_numpy()
+        usados = []
+        for formato in formatos + [None]:
+            if not len(faltam):
+                break
+            if formato is None:
+                datas = pd.to_datetime(distintos[faltam], format='mixed', dayfirst=True, errors='coerce')
+            else:
+                datas = pd.to_datetime(distintos[faltam], format=formato, errors='coerce')
+            # Fora do intervalo de datetime64[ns] conta como inválida
+            datas = datas.where(datas.between(pd.Timestamp.min, pd.Timestamp.max))
+            ok = datas.notna().to_numpy()
+            if ok.any():
+                convertidas[faltam[ok]] = datas[ok].to_numpy(dtype='datetime64[ns]')
+                usados.append(formato or 'inferido')
+            faltam = faltam[~ok]
+
+        resultado = pd.Series(convertidas[codigos], index=serie.index)
+        vazias = codigos == -1
+        invalidas = np.isin(codigos, faltam)
+        descartadas = {
+            'sem_data': int(vazias.sum()),
+            'data_invalida': int(invalidas.sum()),
+            'exemplos': distintos[faltam[:5]].tolist(),
+            'formatos': usados,
+            'distintas': len(distintos),
+        }
+        return resultado, descartadas
+
+    def _registrar_descartadas(self, descartadas, avisar=True):
+        """Somar (e avisar) as linhas descartadas por data vazia ou inválida"""
+        if not (descartadas['sem_data'] or descartadas['data_invalida']):
+            return
+        total = getattr(self, 'linhas_descartadas', None) or {'sem_data': 0, 'data_invalida': 0, 'exemplos': []}
+        total['sem_data'] += descartadas['sem_data']
+        total['data_invalida'] += descartadas['data_invalida']
+        total['exemplos'] = (total['exemplos'] + [e for e in descartadas['exemplos'] if e not in total['exemplos']])[:5]
+        self.linhas_descartadas = total
+        if not avisar:
+            return
+        print(f"⚠️ Linhas descartadas: {descartadas['sem_data']} sem data, {descartadas['data_invalida']} com data inválida"
+              + (f" (ex.: {', '.join(map(repr, descartadas['exemplos']))})" if descartadas['exemplos'] else ""))
+        self.medidor.registrar('linhas_descartadas', **descartadas)
+
+    def texto_descartadas(self):
+        """Resumo das linhas descartadas por data, para a barra de status ('' se nenhuma)"""
+        descartadas = getattr(self, 'linhas_descartadas', None)
+        if not descartadas or not (descartadas['sem_data'] or descartadas['data_invalida']):
+            return ''
+        partes = []
+        if descartadas['sem_data']:
+            partes.append(f"{descartadas['sem_data']:,} sem data")
+        if descartadas['data_invalida']:
+            partes.append(f"{descartadas['data_invalida']:,} com data inválida")
+        return "Linhas descartadas: " + ", ".join(partes) + "."
+
+    # Linhas por bloco na leitura com aviso de progresso (leitor em C)
+    CSV_BLOCO_LINHAS = 500_000
+
+    def _ler_csv(self, file_path, encoding, read_kwargs):
+        """read_csv inteiro; com aviso de progresso e leitor em C, em blocos contando as linhas lidas"""
+        with self.medidor.etapa('ler_csv', encoding=encoding, engine=read_kwargs['engine']) as registro:
+            if getattr(self, 'ao_progresso', None) is None or read_kwargs['engine'] == 'pyarrow':
+                self._etapa("Lendo CSV...")
+                df = pd.read_csv(file_path, encoding=encoding, **read_kwargs)
+            else:
+                blocos = []
+                lidas = 0
+                with pd.read_csv(file_path, encoding=encoding, chunksize=self.CSV_BLOCO_LINHAS, **read_kwargs) as leitor:
+                    for bloco in leitor:
+                        blocos.append(bloco)
+                        lidas += len(bloco)
+                        self._etapa(f"Lendo CSV: {lidas:,} linhas")
+                df = pd.concat(blocos, ignore_index=True) if len(blocos) > 1 else blocos[0]
+            registro['linhas'] = len(df)
+        return df
+
+    # Bytes lidos do começo e do fim do CSV para escolher o encoding
+    AMOSTRA_ENCODING = 1024 * 1024
+    # Bytes por bloco ao validar o UTF-8 do arquivo inteiro
+    BLOCO_UTF8 = 16 * 1024 * 1024
+
+    @classmethod
+    def _validar_encoding(cls, file_path, encoding, limite):
+        """Conferir o arquivo inteiro (até `limite`), em blocos e sem guardá-lo, no encoding das amostras.
+
+        Devolve (encoding, substituir): o mesmo encoding se tudo for válido;
+        com bytes inválidos, decide como `_detectar_encoding`, mas pelo arquivo
+        inteiro: 'latin1' se eles forem maioria, senão o UTF-8 com '\ufffd' no lugar deles.
+        """
+        def blocos(f):
+            f.seek(0)
+            restam = limite
+            while restam:
+                bloco = f.read(min(cls.BLOCO_UTF8, restam))
+                restam = restam - len(bloco) if bloco else 0
+                yield bloco, not restam
+
+        with open(file_path, 'rb') as f:
+            decodificador = codecs.getincrementaldecoder(encoding)()
+            try:
+                for bloco, final in blocos(f):
+                    decodificador.decode(bloco, final=final)
+                return encoding, False
+            except UnicodeDecodeError:
+                pass
+            decodificador = codecs.getincrementaldecoder(encoding)(errors='replace')
+            acentos = invalidos = 0
+            for bloco, final in blocos(f):
+                texto = decodificador.decode(bloco, final=final)
+                ruins = texto.count('\ufffd')
+                invalidos += ruins
+                acentos += len(texto) - len(texto.encode('ascii', errors='ignore')) - ruins
+        return ('latin1', False) if invalidos > acentos else (encoding, True)
+
+    def _ler_trecho(self, file_path, limite, encoding, substituir, read_kwargs):
+        """read_csv dos primeiros `limite` bytes; com `substituir`, bytes inválidos viram '\ufffd'"""
+        kwargs = dict(read_kwargs)
+        recodificar = substituir and kwargs['engine'] != 'c'
+        if substituir and not recodificar:
+            kwargs['encoding_errors'] = 'replace'
+        with io.BufferedReader(TrechoArquivo(file_path, limite, recodificar=encoding if recodificar else None)) as origem:
+            return self._ler_csv(origem, 'utf-8' if recodificar else encoding, kwargs)
+
+    @classmethod
+    def _detectar_encoding(cls, file_path):
+        """'utf-8-sig', 'utf-8' ou 'latin1', decidido por amostras do começo e do fim do arquivo.
+
+        Texto Latin-1 quase nunca forma sequências UTF-8 válidas: se as amostras
+        têm mais caracteres acentuados válidos em UTF-8 do que bytes inválidos,
+        o arquivo é UTF-8 (os poucos bytes ruins viram '\ufffd' na leitura).
+        """
+        with open(file_path, 'rb') as f:
+            inicio = f.read(cls.AMOSTRA_ENCODING)
+            tamanho = f.seek(0, os.SEEK_END)
+            f.seek(max(len(inicio), tamanho - cls.AMOSTRA_ENCODING))
+            fim = f.read()
+        if inicio.startswith(codecs.BOM_UTF8):
+            return 'utf-8-sig'
+        # A amostra do fim pode começar no meio de um caractere: pular os bytes de continuação
+        corte = 0
+        while corte < min(3, len(fim)) and fim[corte] & 0xC0 == 0x80:
+            corte += 1
+        acentos = invalidos = 0
+        for amostra in (inicio, fim[corte:]):
+            # final=False: um caractere cortado no fim da amostra não conta como inválido
+            texto = codecs.getincrementaldecoder('utf-8')(errors='replace').decode(amostra, final=False)
+            ruins = texto.count('\ufffd')
+            invalidos += ruins
+            acentos += len(texto) - len(texto.encode('ascii', errors='ignore')) - ruins
+        return 'latin1' if invalidos > acentos else 'utf-8'
+
+    # Bytes lidos de trás para frente ao procurar a última quebra de linha
+    BLOCO_FIM_LINHA = 64 * 1024
+
+    @classmethod
+    def _fim_linhas_completas(cls, file_path, tamanho):
+        """Byte logo após o último '\n' dentro de `tamanho` (uma linha ainda sendo escrita fica de fora)"""
+        with open(file_path, 'rb') as f:
+            fim = tamanho
+            while fim > 0:
+                inicio = max(0, fim - cls.BLOCO_FIM_LINHA)
+                f.seek(inicio)
+                quebra = f.read(fim - inicio).rfind(b'\n')
+                if quebra >= 0:
+                    return inicio + quebra + 1
+                fim = inicio
+        # Sem nenhuma quebra (só o cabeçalho, sem '\n'): o arquivo inteiro
+        return tamanho
+
+    @staticmethod
+    def normalize_col_name(s):
+        if s is None:
+            return ''
+        s = str(s).strip().lower()
+        s = unicodedata.normalize('NFKD', s)
+        s = ''.join(ch for ch in s if not unicodedata.combining(ch))
+        s = re.sub(r'[^0-9a-z]+', ' ', s)
+        s = re.sub(r'\s+', ' ', s).strip()
+        return s
+
+    @medido('processar_csv')
     def process_csv_data(self, file_path):
         """Ler e preparar dados do CSV (normalização robusta de nomes de coluna)"""
-        import unicodedata
-        import re
-
-        def normalize_col_name(s):
-            if s is None:
-                return ''
-            s = str(s).strip().lower()
-            s = unicodedata.normalize('NFKD', s)
-            s = ''.join(ch for ch in s if not unicodedata.combining(ch))
-            s = re.sub(r'[^0-9a-z]+', ' ', s)
-            s = re.sub(r'\s+', ' ', s).strip()
-            return s
+        df, (offset, tamanho) = self._ler_e_preparar(file_path)
 
-        print(f"Carregando dados de: {file_path}")
-        read_kwargs = dict(sep=';', engine='python', dtype=str)
-        try:
-            df = pd.read_csv(file_path, encoding='utf-8', **read_kwargs)
-        except Exception:
-            df = pd.read_csv(file_path, encoding='latin1', **read_kwargs)
+        self.df = df
+        self._etapa(f"{len(df):,} linhas — montando rótulos de clientes")
+        self.build_cliente_labels()
+        if self.compacto:
+            self.df = self._compactar(self.df, relatorio=self.relatorio_memoria)
+        self._atualizar_disponiveis()
+        self._marcar_lido(file_path, offset, tamanho)
 
-        print("Colunas originais:", list(df.columns))
+    def _ler_e_preparar(self, file_path):
+        """Ler um CSV, detectar as colunas e preparar as linhas (sem rótulos nem cubo).
 
-        normalized_map = {col: normalize_col_name(col) for col in df.columns}
+        Devolve o dataframe e (até que byte o arquivo foi lido, tamanho do arquivo antes da leitura).
+        """
+        print(f"Carregando dados de: {file_path}")
+        read_kwargs = dict(sep=';', engine=self._csv_engine(), dtype=str)
+        self._encoding_csv = self._detectar_encoding(file_path)
+        self._cabecalho_csv = None
+        self._colunas_lidas = None
+        self.linhas_descartadas = {'sem_data': 0, 'data_invalida': 0, 'exemplos': []}
+        if self.compacto:
+            # Só as colunas detectadas (e o PI) são lidas; as demais nunca são usadas
+            self._colunas_lidas = self._colunas_usadas(self._cabecalho(file_path))
+            read_kwargs['usecols'] = self._colunas_lidas
+        # Tamanho fixado antes da leitura: linhas anexadas durante a carga ficam para atualizar_arquivo.
+        # Só com o arquivo observado uma última linha sem '\n' (ainda sendo escrita) fica para depois.
+        tamanho = os.path.getsize(file_path)
+        tamanho_lido = self._fim_linhas_completas(file_path, tamanho) if self.observar else tamanho
+        encoding, substituir = self._encoding_csv, False
+        if encoding != 'latin1' and read_kwargs['engine'] != 'c':
+            # O pyarrow não tem encoding_errors nem erro de decodificação: validar antes, em blocos
+            encoding, substituir = self._validar_encoding(file_path, encoding, tamanho_lido)
+        try:
+            df = self._ler_trecho(file_path, tamanho_lido, encoding, substituir, read_kwargs)
+        except UnicodeDecodeError:
+            # Leitor em C: bytes inválidos fora das amostras; o arquivo inteiro decide o encoding
+            encoding, substituir = self._validar_encoding(file_path, encoding, tamanho_lido)
+            df = self._ler_trecho(file_path, tamanho_lido, encoding, substituir, read_kwargs)
+        if encoding != self._encoding_csv:
+            print("CSV não é UTF-8 válido — lido como Latin-1.")
+        elif substituir:
+            print("CSV UTF-8 com bytes inválidos — trocados por '\ufffd'.")
+        self._encoding_csv = encoding
+
+        print(f"Colunas originais ({self._encoding_csv}):", list(df.columns))
+
+        if self._cabecalho_csv is None:
+            self._cabecalho_csv = list(df.columns)
+        normalized_map = {col: self.normalize_col_name(col) for col in df.columns}
         df.rename(columns=normalized_map, inplace=True)
 
         print("Colunas normalizadas:", list(df.columns))
 
-        # Detecta automaticamente colunas
-        data_col = next((c for c in df.columns if ('data' in c and ('emiss' in c or 'emissao' in c or 'emissão' in c))), None)
-        total_col = next((c for c in df.columns if ('total' in c and ('liquido' in c or 'liquid' in c or 'valor' in c or 'total' == c))), None)
-        cliente_col = next((c for c in df.columns if ('cliente' in c and 'veiculo' not in c)), None)
-        campanha_col = next((c for c in df.columns if 'campanha' in c), None)
-        estado_cliente_col = next((c for c in df.columns if ('estado' in c and 'cliente' in c)), None)
-        cnpj_col = next((c for c in df.columns if ('cnpj' in c and 'cliente' in c)), None)
+        self.colunas_detectadas = self._detectar_colunas(df.columns)
+        self._etapa(f"{len(df):,} linhas lidas — convertendo valores e datas")
+        df = self._preparar_linhas(df)
+        self.has_cnpj_data = self.colunas_detectadas['cnpj'] is not None
+        return df, (tamanho_lido, tamanho)
+
+    @classmethod
+    def _colunas_usadas(cls, cabecalho):
+        """Colunas do cabeçalho original que a preparação usa (detectadas e PI)"""
+        normalizadas = {col: cls.normalize_col_name(col) for col in cabecalho}
+        detectadas = cls._detectar_colunas(normalizadas.values())
+        usadas = {col for col in detectadas.values() if col} | {'pi'}
+        return [col for col, nome in normalizadas.items() if nome in usadas]
+
+    @staticmethod
+    def _detectar_colunas(colunas):
+        """Colunas (já normalizadas) de data, total, cliente, campanha, UF e CNPJ"""
+        colunas = list(colunas)
+        data_col = next((c for c in colunas if ('data' in c and ('emiss' in c or 'emissao' in c or 'emissão' in c))), None)
+        total_col = next((c for c in colunas if ('total' in c and ('liquido' in c or 'liquid' in c or 'valor' in c or 'total' == c))), None)
+        cliente_col = next((c for c in colunas if ('cliente' in c and 'veiculo' not in c)), None)
+        campanha_col = next((c for c in colunas if 'campanha' in c), None)
+        estado_cliente_col = next((c for c in colunas if ('estado' in c and 'cliente' in c)), None)
+        cnpj_col = next((c for c in colunas if ('cnpj' in c and 'cliente' in c)), None)
         if not cnpj_col:
-            cnpj_col = next((c for c in df.columns if 'cnpj' in c), None)
+            cnpj_col = next((c for c in colunas if 'cnpj' in c), None)
+
+        detectadas = {
+            'data': data_col,
+            'total': total_col,
+            'cliente': cliente_col,
+            'campanha': campanha_col,
+            'estado_cliente': estado_cliente_col,
+            'cnpj': cnpj_col,
+        }
 
         print("Detectado -> data_col:", data_col, " total_col:", total_col, " cliente_col:", cliente_col, " campanha_col:", campanha_col)
 
@@ -89,29 +810,34 @@ class PowerBIInterativo:
             raise ValueError(
                 "Colunas de data e total líquido não foram encontradas.\n"
                 "Verifique os nomes das colunas no CSV. Colunas normalizadas: "
-                + ", ".join(list(df.columns))
+                + ", ".join(colunas)
             )
-
-        def parse_valor(v):
-            if pd.isna(v):
-                return 0.0
-            if isinstance(v, (int, float)):
-                return float(v)
-            s = str(v).strip()
-            s = s.replace('r$', '').replace(' ', '').replace('.', '').replace(',', '.')
-            try:
-                return float(s)
-            except:
-                m = re.search(r'[-+]?\d+(\.\d+)?', s)
-                return float(m.group(0)) if m else 0.0
-
-        df['valor'] = df[total_col].apply(parse_valor)
-        df['data'] = pd.to_datetime(df[data_col], dayfirst=True, errors='coerce')
-        df = df.dropna(subset=['data'])
+        return detectadas
+
+    @medido('preparar_linhas')
+    def _preparar_linhas(self, df):
+        """Colunas derivadas (valor, data, ano/mês, cliente, campanha, UF, CNPJ) a partir das detectadas"""
+        data_col = self.colunas_detectadas['data']
+        total_col = self.colunas_detectadas['total']
+        cliente_col = self.colunas_detectadas['cliente']
+        campanha_col = self.colunas_detectadas['campanha']
+        estado_cliente_col = self.colunas_detectadas['estado_cliente']
+        cnpj_col = self.colunas_detectadas['cnpj']
+
+        with self.medidor.etapa('converter_valores', linhas=len(df)):
+            df['valor'] = self._parse_valores(df[total_col])
+        with self.medidor.etapa('converter_datas', linhas=len(df)) as registro:
+            df['data'], descartadas = self._converter_datas(df[data_col])
+            registro.update(formatos=descartadas.pop('formatos'), distintas=descartadas.pop('distintas'))
+            df = df.dropna(subset=['data'])
+        self._registrar_descartadas(descartadas)
 
         df['ano'] = df['data'].dt.year
         df['mes'] = df['data'].dt.month
-        df['anomes'] = df['data'].dt.strftime('%Y-%m')
+        # strftime formata linha a linha; os meses distintos são poucos
+        chave_mes, meses = pd.factorize(df['ano'] * 100 + df['mes'])
+        rotulos_mes = np.array([f"{m // 100:04d}-{m % 100:02d}" for m in meses], dtype=object)
+        df['anomes'] = pd.Series(rotulos_mes[chave_mes], index=df.index, dtype=df[data_col].dtype)
 
         df['cliente'] = df[cliente_col] if cliente_col in df.columns else 'Desconhecido'
         df['campanha'] = df[campanha_col] if campanha_col in df.columns else 'Sem Campanha'
@@ -128,13 +854,70 @@ class PowerBIInterativo:
             df['cnpj'] = df[cnpj_col].astype(str).fillna('')
         else:
             df['cnpj'] = ''
-        df['cnpj_digits'] = df['cnpj'].apply(self._only_digits)
-        self.has_cnpj_data = cnpj_col is not None
+        df['cnpj_digits'] = df['cnpj'].str.replace(r'\D', '', regex=True).fillna('')
+        return df
 
-        self.df = df
-        self.build_cliente_labels()
+    # ==========================================================
+    # 🗜️ Modo compacto (menos memória para o dataframe carregado)
+    # ==========================================================
+    # Colunas que a aplicação usa depois da preparação; as originais detectadas
+    # (data de emissão, total líquido, ...) já foram copiadas para estas
+    COLUNAS_PREPARADAS = ['valor', 'data', 'ano', 'mes', 'anomes', 'cliente', 'campanha',
+                          'estado_cliente', 'cnpj', 'cnpj_digits', 'cliente_label', 'pi']
+    # Texto muito repetido, guardado como categoria (códigos inteiros + valores distintos)
+    COLUNAS_CATEGORICAS = ['cliente', 'campanha', 'estado_cliente', 'anomes', 'cliente_label',
+                           'cnpj', 'cnpj_digits', 'pi']
+
+    @medido('compactar')
+    def _compactar(self, df, relatorio=False):
+        """Descartar as colunas originais já copiadas, texto em categorias e ano/mês em inteiros pequenos"""
+        antes = df.memory_usage(deep=True, index=False) if relatorio else None
+        descartar = [
+            col for col in set(self.colunas_detectadas.values())
+            if col and col in df.columns and col not in self.COLUNAS_PREPARADAS
+        ]
+        df = df.drop(columns=descartar)
+        for col in self.COLUNAS_CATEGORICAS:
+            if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+                df[col] = df[col].astype('category')
+        df['ano'] = df['ano'].astype(np.int16)
+        df['mes'] = df['mes'].astype(np.int8)
+        if relatorio:
+            self._imprimir_memoria(antes, df.memory_usage(deep=True, index=False), df.dtypes)
+        return df
+
+    def _imprimir_memoria(self, antes, depois, tipos):
+        """Bytes por coluna antes e depois da compactação"""
+        largura = max(len(col) for col in antes.index)
+        print("Memória por coluna (antes -> depois):")
+        for col, bytes_antes in antes.items():
+            if col in depois.index:
+                print(f"  {col:<{largura}} {bytes_antes / 2**20:10.1f} MB -> {depois[col] / 2**20:8.1f} MB  ({tipos[col]})")
+            else:
+                print(f"  {col:<{largura}} {bytes_antes / 2**20:10.1f} MB -> descartada")
+        nao_lidas = [col for col in self._cabecalho_csv if col not in (self._colunas_lidas or self._cabecalho_csv)]
+        if nao_lidas:
+            print(f"  Não lidas do CSV: {', '.join(nao_lidas)}")
+        print(f"  Total {antes.sum() / 2**20:.1f} MB -> {depois.sum() / 2**20:.1f} MB")
+
+    def _concatenar(self, novos):
+        """self.df com as linhas novas; no modo compacto, une as categorias para as colunas não voltarem a texto"""
+        if self.compacto:
+            novos = self._compactar(novos)
+            for col in self.COLUNAS_CATEGORICAS:
+                if col in novos.columns and isinstance(self.df[col].dtype, pd.CategoricalDtype):
+                    faltam = novos[col].cat.categories.difference(self.df[col].cat.categories)
+                    self.df[col] = self.df[col].cat.add_categories(faltam)
+                    novos[col] = novos[col].cat.set_categories(self.df[col].cat.categories)
+        return pd.concat([self.df, novos], ignore_index=True)
+
+
+    def _atualizar_disponiveis(self):
+        df = self.df
+        self._etapa(f"{len(df):,} linhas — montando cubo mensal")
+        self.build_cube()
         self.available_years = sorted(df['ano'].unique().tolist())
-        self.available_clientes = sorted(self.df['cliente_label'].dropna().unique().tolist())
+        self.available_clientes = sorted(df['cliente_label'].dropna().unique().tolist())
         self.available_campanhas = sorted(df['campanha'].dropna().unique().tolist())
 
         print(f"Arquivo carregado com {len(df)} linhas.")
@@ -142,43 +925,1109 @@ class PowerBIInterativo:
         print(f"Clientes únicos: {len(self.available_clientes)}")
         print(f"Campanhas únicas: {len(self.available_campanhas)}")
 
+    @medido('rotulos')
     def build_cliente_labels(self):
-        df_sorted = self.df.sort_values('data')
-        label_map = {}
+        """Rótulo "cliente - UF" por linha, usando a primeira ocorrência (por data) de cada CNPJ"""
+        df = self.df
+        digits = df['cnpj_digits'].fillna('')
+
+        # Ordenação estável: em datas repetidas vence a linha que aparece antes no arquivo
+        primeiros = (
+            df.loc[digits != '', ['cnpj_digits', 'cliente', 'estado_cliente', 'data']]
+            .sort_values('data', kind='stable')
+            .drop_duplicates('cnpj_digits')
+        )
 
-        for _, row in df_sorted.iterrows():
-            digits = row.get('cnpj_digits', '')
-            if not digits:
-                continue
-            if digits not in label_map:
-                label_map[digits] = {
-                    'cliente': row.get('cliente', 'Desconhecido'),
-                    'estado': row.get('estado_cliente', '')
-                }
+        self.cnpj_label_map = {
+            d: {'cliente': c, 'estado': e}
+            for d, c, e in zip(primeiros['cnpj_digits'], primeiros['cliente'], primeiros['estado_cliente'])
+        }
+
+        self._primeiras_datas = pd.Series(primeiros['data'].to_numpy(), index=primeiros['cnpj_digits'].to_numpy())
 
-        self.cnpj_label_map = label_map
+        self.df['cliente_label'] = self._rotulos_cliente(df, primeiros)
+        self._ordenar_clientes()
+
+    @staticmethod
+    def _rotulos_cliente(df, primeiros):
+        """"cliente - UF" de cada linha de `df`, usando os dados da primeira ocorrência do CNPJ em `primeiros`"""
+        digits = df['cnpj_digits'].fillna('')
+        # Posição de cada linha na tabela de primeiras ocorrências (-1 = sem CNPJ)
+        pos = pd.Index(primeiros['cnpj_digits']).get_indexer(digits)
+        tem_info = pos >= 0
+        pos = np.where(tem_info, pos, 0)
+
+        def do_cnpj(coluna, padrao):
+            valores = primeiros[coluna].to_numpy(dtype=object)[pos] if len(primeiros) else np.full(len(df), padrao, dtype=object)
+            info = pd.Series(valores, index=df.index).fillna(padrao)
+            return info.where(tem_info & (info != ''), df[coluna])
+
+        nome = do_cnpj('cliente', '')
+        uf = do_cnpj('estado_cliente', '').fillna('')
+        sufixo = (' - ' + uf).where(uf != '', '')
+        return nome.astype(str) + sufixo
+
+    # ==========================================================
+    # 🧊 Cubo mensal pré-agregado (consultado a cada troca de filtro)
+    # ==========================================================
+    CUBO_CHAVES = ['cliente_label', 'cnpj_digits', 'campanha', 'ano', 'anomes']
+
+    @classmethod
+    def _agregar_cubo(cls, df):
+        """Soma, contagem e máximo de valor por (cliente_label, cnpj_digits, campanha, ano, anomes).
+
+        `primeira` é a posição da primeira linha da célula no arquivo e
+        `linha_pico` a posição da primeira linha com o valor máximo; com elas a
+        ordem dos clientes e o mês do pico saem iguais aos calculados nas linhas brutas.
+        """
+        base = df[cls.CUBO_CHAVES + ['valor']].reset_index(drop=True)
+        base['linha'] = np.arange(len(base))
+        grupos = base.groupby(cls.CUBO_CHAVES, sort=False, dropna=False, observed=True)
+        cubo = grupos.agg(
+            soma=('valor', 'sum'),
+            contagem=('valor', 'size'),
+            maximo=('valor', 'max'),
+            primeira=('linha', 'min'),
+        )
+        cubo['linha_pico'] = grupos['valor'].idxmax()
+        cubo = cubo.reset_index()
+        for col in ('cliente_label', 'cnpj_digits', 'campanha', 'anomes'):
+            if isinstance(cubo[col].dtype, pd.CategoricalDtype):
+                # Modo compacto: categorias do dataframe inteiro; o cubo fica só com as presentes, ordenadas
+                cubo[col] = cubo[col].astype(object)
+            cubo[col] = cubo[col].astype('category')
+        return cubo
+
+    @medido('cubo')
+    def build_cube(self):
+        self.cubo = self._agregar_cubo(self.df)
+        self._indexar_cubo()
+        if 'pi' in self.df.columns:
+            self._pis_por_celula = self.df.groupby(['ano', 'campanha', 'pi'], sort=False, observed=True).size()
+            self.pis_recorrentes = self._contar_pis_recorrentes(self._pis_por_celula)
+        else:
+            self.pis_recorrentes = None
+
+    def _indexar_cubo(self):
+        # Posições (ordenadas) das células do cubo por ano e por campanha
+        self.idx_ano = self.cubo.groupby('ano', sort=False).indices
+        self.idx_campanha = self.cubo.groupby('campanha', sort=False, observed=True).indices
+        self.idx_cnpj = self.cubo.groupby('cnpj_digits', sort=False, observed=True).indices
+        self.indice_cnpj = IndiceCnpj(self.cnpj_label_map)
+        # Cubo novo: as visões calculadas sobre o anterior deixam de valer
+        self._visoes = CacheVisoes(self.CACHE_VISOES_BYTES)
+        self._cnpjs_por_rotulo = None
 
-        def label_row(row):
-            digits = row.get('cnpj_digits', '')
-            estado = row.get('estado_cliente', '')
-            if digits and digits in label_map:
-                info = label_map[digits]
-                nome = info.get('cliente') or row.get('cliente', 'Desconhecido')
-                uf = info.get('estado') or estado
+    @staticmethod
+    def _contar_pis_recorrentes(por_celula):
+        """PIs com 2+ registros para cada combinação de ano/campanha (incluindo 'Todos'/'Todas').
+
+        `por_celula` é a contagem de registros por (ano, campanha, pi).
+        """
+        contagens = {}
+
+        recorrentes = (por_celula >= 2).groupby(level=['ano', 'campanha'], sort=False, observed=True).sum()
+        contagens.update(recorrentes.to_dict())
+        for nivel, todos in (('ano', 'Todas'), ('campanha', 'Todos')):
+            soma = por_celula.groupby(level=[nivel, 'pi'], sort=False, observed=True).sum()
+            recorrentes = (soma >= 2).groupby(level=nivel, sort=False, observed=True).sum()
+            if nivel == 'ano':
+                contagens.update({(ano, todos): n for ano, n in recorrentes.items()})
             else:
-                nome = row.get('cliente', 'Desconhecido')
-                uf = estado
+                contagens.update({(todos, campanha): n for campanha, n in recorrentes.items()})
+        soma = por_celula.groupby(level='pi', sort=False, observed=True).sum()
+        contagens[('Todos', 'Todas')] = (soma >= 2).sum()
+        return {chave: int(n) for chave, n in contagens.items()}
+
+    def _pis_recorrentes(self, ano, campanha):
+        """Quantidade de PIs com 2+ registros na seleção de ano/campanha"""
+        chave = (ano if ano == 'Todos' else int(ano), campanha)
+        return self.pis_recorrentes.get(chave, 0)
+
+    @staticmethod
+    def _series_por_cliente(selecao):
+        """Série mensal ({'anomes', 'valor'}) de cada cliente, na ordem em que aparecem no arquivo"""
+        if selecao.empty:
+            return []
+        clientes = selecao.categorias('cliente_label')
+        meses = selecao.categorias('anomes')
+        cod_cliente = selecao.codigos('cliente_label').astype(np.int64)
+        cod_mes = selecao.codigos('anomes')
+
+        # O cubo está na ordem da primeira linha de cada célula, então a ordem de
+        # aparição dos códigos já é a ordem dos clientes no arquivo
+        ordem = pd.unique(cod_cliente)
+
+        chave = cod_cliente * len(meses) + cod_mes
+        ids, chaves = pd.factorize(chave)
+        somas = np.bincount(ids, weights=selecao.valores('soma'), minlength=len(chaves))
+        ordenado = np.argsort(chaves)
+        chaves, somas = chaves[ordenado], somas[ordenado]
+        cliente_da_chave = chaves // len(meses)
+        mes_da_chave = meses.to_numpy()[chaves % len(meses)]
+
+        inicio = np.searchsorted(cliente_da_chave, ordem, side='left')
+        fim = np.searchsorted(cliente_da_chave, ordem, side='right')
+        return [
+            (clientes[c], {'anomes': mes_da_chave[i:j], 'valor': somas[i:j]})
+            for c, i, j in zip(ordem, inicio, fim)
+        ]
 
-            uf_text = f" - {uf}" if uf else ""
-            return f"{nome}{uf_text}"
+    @staticmethod
+    def _agrupar_outros(series, top_n):
+        """Manter os `top_n` clientes de maior valor total (na ordem original) e somar os demais na série "Outros"."""
+        if not top_n or len(series) <= top_n:
+            return series
+        totais = np.array([resumo['valor'].sum() for _, resumo in series])
+        # Ordenação estável: em empate vence o cliente que aparece antes no arquivo
+        manter = np.zeros(len(series), dtype=bool)
+        manter[np.argsort(-totais, kind='stable')[:top_n]] = True
+
+        resto = [resumo for (_, resumo), m in zip(series, manter) if not m]
+        meses, ids = np.unique(np.concatenate([r['anomes'] for r in resto]), return_inverse=True)
+        somas = np.bincount(ids, weights=np.concatenate([r['valor'] for r in resto]), minlength=len(meses))
+        outros = (f"Outros ({len(resto)} clientes)", {'anomes': meses, 'valor': somas})
+        return [serie for serie, m in zip(series, manter) if m] + [outros]
 
-        self.df['cliente_label'] = self.df.apply(label_row, axis=1)
+    @staticmethod
+    def _estatisticas(selecao):
+        total = selecao.valores('soma').sum()
+        media = total / selecao.valores('contagem').sum()
+        maximos = selecao.valores('maximo')
+        pico = maximos.max()
+        no_pico = np.flatnonzero(maximos == pico)
+        primeiro = no_pico[selecao.valores('linha_pico')[no_pico].argmin()]
+        mes_pico = selecao.categorias('anomes')[selecao.codigos('anomes')[primeiro]]
+        return total, media, pico, mes_pico
+
+    def _ordenar_clientes(self):
         self.cliente_label_order = [
             (digits, info.get('cliente', 'Desconhecido'), info.get('estado', ''))
-            for digits, info in label_map.items()
+            for digits, info in self.cnpj_label_map.items()
         ]
         self.cliente_label_order.sort(key=lambda x: (x[1] or '').lower())
 
+    # ==========================================================
+    # 💾 Cache em disco (Parquet) do dataframe já preparado
+    # ==========================================================
+    @staticmethod
+    def _cache_paths(file_path):
+        base = os.path.abspath(file_path) + '.bicache'
+        return base + '.parquet', base + '.json'
+
+    @staticmethod
+    def _file_hash(file_path, bloco=4 * 1024 * 1024):
+        h = hashlib.blake2b(digest_size=16)
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(bloco), b''):
+                h.update(chunk)
+        return h.hexdigest()
+
+    @medido('carga')
+    def load_data(self, file_path, usar_cache=True, recriar_cache=False, processos=None):
+        """Carregar o CSV, usando o cache em Parquet quando ele ainda for válido.
+
+        `file_path` também pode ser uma lista de CSVs, lidos em paralelo e sem cache.
+        """
+        if isinstance(file_path, (list, tuple)):
+            if len(file_path) > 1:
+                self.carregar_varios(file_path, processos=processos)
+                return
+            file_path = file_path[0]
+
+        if not usar_cache:
+            self.process_csv_data(file_path)
+            return
+
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            print("pyarrow não instalado — cache desativado.")
+            self.process_csv_data(file_path)
+            return
+
+        if not recriar_cache and self._load_cache(file_path):
+            return
+
+        self.process_csv_data(file_path)
+        self._save_cache(file_path)
+
+    def _cache_key(self, file_path, com_hash=True):
+        st = os.stat(file_path)
+        chave = {
+            'schema': CACHE_SCHEMA_VERSION,
+            'path': os.path.abspath(file_path),
+            'size': st.st_size,
+            'mtime_ns': st.st_mtime_ns,
+            'compacto': self.compacto,
+        }
+        if com_hash:
+            chave['hash'] = self._file_hash(file_path)
+        return chave
+
+    @medido('ler_cache')
+    def _load_cache(self, file_path):
+        parquet_path, meta_path = self._cache_paths(file_path)
+        if not (os.path.exists(parquet_path) and os.path.exists(meta_path)):
+            return False
+
+        try:
+            with open(meta_path, encoding='utf-8') as f:
+                meta = json.load(f)
+            chave = self._cache_key(file_path, com_hash=False)
+            salva = meta.get('chave', {})
+            if any(salva.get(k) != v for k, v in chave.items()):
+                print("Cache desatualizado — recarregando CSV.")
+                return False
+            # Tamanho e data batem; só então vale ler o arquivo inteiro para o hash
+            if salva.get('hash') != self._file_hash(file_path):
+                print("Conteúdo do CSV mudou — recarregando CSV.")
+                return False
+
+            print(f"Carregando cache: {parquet_path}")
+            self._etapa("Lendo cache...")
+            self.df = pd.read_parquet(parquet_path)
+        except Exception as e:
+            print(f"Cache inválido ({e}) — recarregando CSV.")
+            return False
+
+        self.colunas_detectadas = meta['colunas_detectadas']
+        self.has_cnpj_data = meta['has_cnpj_data']
+        self.linhas_descartadas = meta.get('linhas_descartadas')
+        self.cnpj_label_map = {
+            digits: {'cliente': cliente, 'estado': estado}
+            for digits, cliente, estado in meta['cnpj_label_map']
+        }
+        self._ordenar_clientes()
+        self._atualizar_disponiveis()
+        self._marcar_lido(file_path, chave['size'])
+        return True
+
+    @medido('salvar_cache')
+    def _save_cache(self, file_path):
+        parquet_path, meta_path = self._cache_paths(file_path)
+        chave = self._cache_key(file_path)
+        lido = self._arquivo_lido
+        if chave['size'] != lido['tamanho']:
+            # O CSV cresceu depois da leitura: o cache não o representaria
+            print("CSV mudou durante a carga — cache não salvo.")
+            return
+        if lido['offset'] != lido['tamanho']:
+            print("Última linha do CSV ainda incompleta — cache não salvo.")
+            return
+        meta = {
+            'chave': chave,
+            'colunas_detectadas': self.colunas_detectadas,
+            'has_cnpj_data': self.has_cnpj_data,
+            'linhas_descartadas': getattr(self, 'linhas_descartadas', None),
+            'cnpj_label_map': [
+                [digits, info.get('cliente'), info.get('estado')]
+                for digits, info in self.cnpj_label_map.items()
+            ],
+        }
+        try:
+            self.df.to_parquet(parquet_path)
+            # O JSON é escrito por último: sem ele o cache nunca é considerado válido
+            with open(meta_path, 'w', encoding='utf-8') as f:
+                json.dump(meta, f, ensure_ascii=False)
+            print(f"Cache salvo em: {parquet_path}")
+        except Exception as e:
+            print(f"Não foi possível salvar o cache: {e}")
+
+    # ==========================================================
+    # 📚 Vários CSVs (um por mês/região) lidos em paralelo
+    # ==========================================================
+    @staticmethod
+    def resolver_arquivos(caminho):
+        """CSVs de um caminho: o próprio arquivo, todos os *.csv de uma pasta ou os que casam com um glob"""
+        if os.path.isdir(caminho):
+            return sorted(glob.glob(os.path.join(caminho, '*.csv')))
+        if any(ch in caminho for ch in '*?['):
+            return sorted(p for p in glob.glob(caminho) if os.path.isfile(p))
+        return [caminho] if os.path.isfile(caminho) else []
+
+    @medido('carregar_varios')
+    def carregar_varios(self, arquivos, processos=None):
+        """Ler os CSVs num pool de processos e juntar tudo num único dataframe e cubo.
+
+        Cada arquivo passa pela mesma normalização e detecção de colunas de
+        `process_csv_data`; as colunas detectadas precisam ser as mesmas em todos.
+        """
+        print(f"Carregando {len(arquivos)} arquivos.")
+        resultados = {}
+        with ProcessPoolExecutor(max_workers=processos) as pool:
+            futuros = {pool.submit(_preparar_arquivo, arquivo, self.compacto): arquivo for arquivo in arquivos}
+            for n, futuro in enumerate(as_completed(futuros), 1):
+                arquivo = futuros[futuro]
+                resultados[arquivo] = futuro.result()
+                df, _, _, segundos, _, _ = resultados[arquivo]
+                print(f"  {os.path.basename(arquivo)}: {len(df):,} linhas em {segundos:.2f}s")
+                self._etapa(f"{n}/{len(arquivos)} arquivos lidos")
+
+        referencia = resultados[arquivos[0]][1]
+        divergentes = [a for a in arquivos if resultados[a][1] != referencia]
+        if divergentes:
+            raise ValueError(
+                "As colunas detectadas não são iguais em todos os arquivos.\n"
+                f"{os.path.basename(arquivos[0])}: {referencia}\n"
+                + "\n".join(f"{os.path.basename(a)}: {resultados[a][1]}" for a in divergentes)
+            )
+
+        self.colunas_detectadas = referencia
+        self.has_cnpj_data = resultados[arquivos[0]][2]
+        self.linhas_descartadas = None
+        for arquivo in arquivos:
+            self._registrar_descartadas(resultados[arquivo][5], avisar=False)
+        # Ordem dos arquivos (nomes ordenados) = ordem das linhas, como num CSV concatenado
+        self.df = pd.concat([resultados[a][0] for a in arquivos], ignore_index=True)
+        self._etapa(f"{len(self.df):,} linhas — montando rótulos de clientes")
+        self.build_cliente_labels()
+        if self.compacto:
+            self._cabecalho_csv, self._colunas_lidas = resultados[arquivos[0]][4]
+            self.df = self._compactar(self.df, relatorio=self.relatorio_memoria)
+        self._atualizar_disponiveis()
+        self._arquivo_lido = None
+
+    # ==========================================================
+    # 📥 Leitura incremental do CSV (linhas anexadas ao final)
+    # ==========================================================
+    # Bytes do início e do trecho antes do ponto já lido usados para detectar reescrita
+    ASSINATURA_BYTES = 64 * 1024
+
+    @classmethod
+    def _assinatura(cls, file_path, offset):
+        h = hashlib.blake2b(digest_size=16)
+        with open(file_path, 'rb') as f:
+            h.update(f.read(min(offset, cls.ASSINATURA_BYTES)))
+            inicio = max(0, offset - cls.ASSINATURA_BYTES)
+            f.seek(inicio)
+            h.update(f.read(offset - inicio))
+        return h.hexdigest()
+
+    def _marcar_lido(self, file_path, offset, tamanho=None):
+        """Guardar até que byte o CSV já foi consumido (e o tamanho que ele tinha ao ser lido)"""
+        self._arquivo_lido = {
+            'offset': offset,
+            'tamanho': offset if tamanho is None else tamanho,
+            'mtime_ns': os.stat(file_path).st_mtime_ns,
+            'assinatura': self._assinatura(file_path, offset),
+        }
+
+    def verificar_arquivo(self, file_path):
+        """'igual', 'cresceu' ou 'reescrito' (truncado ou alterado antes do ponto já lido)"""
+        lido = self._arquivo_lido
+        st = os.stat(file_path)
+        if st.st_size < lido['offset']:
+            return 'reescrito'
+        if st.st_size == lido['offset'] and st.st_mtime_ns == lido['mtime_ns']:
+            return 'igual'
+        if self._assinatura(file_path, lido['offset']) != lido['assinatura']:
+            return 'reescrito'
+        return 'cresceu' if st.st_size > lido['offset'] else 'igual'
+
+    @medido('atualizar_arquivo')
+    def atualizar_arquivo(self, file_path, usar_cache=True):
+        """Trazer os dados em dia com o CSV: anexa só o final novo, ou recarrega tudo se ele foi reescrito.
+
+        Devolve (situação, linhas novas) com situação 'igual', 'anexado' ou 'recarregado'.
+        """
+        if isinstance(file_path, (list, tuple)):
+            raise ValueError("Observar o arquivo só é possível com um único CSV.")
+        situacao = self.verificar_arquivo(file_path)
+        if situacao == 'reescrito':
+            print("CSV reescrito — recarregando tudo.")
+            self.load_data(file_path, usar_cache=usar_cache)
+            return 'recarregado', len(self.df)
+        if situacao == 'igual':
+            return 'igual', 0
+        return 'anexado', self._ler_final(file_path)
+
+    def _encoding(self, file_path):
+        if getattr(self, '_encoding_csv', None) is None:
+            self._encoding_csv = self._detectar_encoding(file_path)
+        return self._encoding_csv
+
+    def _cabecalho(self, file_path):
+        if getattr(self, '_cabecalho_csv', None) is None:
+            colunas = pd.read_csv(file_path, sep=';', nrows=0, encoding=self._encoding(file_path),
+                                  encoding_errors='replace').columns
+            self._cabecalho_csv = list(colunas)
+        return self._cabecalho_csv
+
+    def _ler_final(self, file_path):
+        """Ler do último byte consumido até a última linha completa e anexar as linhas"""
+        offset = self._arquivo_lido['offset']
+        with open(file_path, 'rb') as f:
+            f.seek(offset)
+            bloco = f.read()
+        # Uma linha ainda sendo escrita fica para a próxima leitura
+        fim = bloco.rfind(b'\n') + 1
+        if not fim:
+            return 0
+        bloco = bloco[:fim]
+        texto = bloco.decode(self._encoding(file_path), errors='replace')
+
+        cabecalho = self._cabecalho(file_path)
+        if self.compacto and getattr(self, '_colunas_lidas', None) is None:
+            self._colunas_lidas = self._colunas_usadas(cabecalho)
+        novos = pd.read_csv(io.StringIO(texto), sep=';', header=None, names=cabecalho, dtype=str, engine='c')
+        # Seleção depois da leitura: com usecols, um trecho só de linhas sem os campos finais vira ParserError
+        if getattr(self, '_colunas_lidas', None) is not None:
+            novos = novos[self._colunas_lidas]
+        novos.rename(columns={col: self.normalize_col_name(col) for col in cabecalho}, inplace=True)
+        novos = self._preparar_linhas(novos)
+        if len(novos):
+            self._anexar_linhas(novos)
+        self._marcar_lido(file_path, offset + fim)
+        print(f"{len(novos)} novas linhas anexadas (total: {len(self.df)}).")
+        return len(novos)
+
+    def _anexar_linhas(self, novos):
+        """Anexar linhas já preparadas, atualizando rótulos, cubo e listas sem reprocessar o restante"""
+        inicio = len(self.df)
+        novos = novos.reset_index(drop=True)
+
+        if getattr(self, '_primeiras_datas', None) is None:
+            com_cnpj = self.df[self.df['cnpj_digits'] != '']
+            self._primeiras_datas = com_cnpj.groupby('cnpj_digits', sort=False, observed=True)['data'].min()
+
+        digits = novos['cnpj_digits'].fillna('')
+        primeiros = (
+            novos.loc[digits != '', ['cnpj_digits', 'cliente', 'estado_cliente', 'data']]
+            .sort_values('data', kind='stable')
+            .drop_duplicates('cnpj_digits')
+        )
+        anteriores = primeiros['cnpj_digits'].map(self._primeiras_datas)
+        if (primeiros['data'] < anteriores).any():
+            # Uma linha nova ficou sendo a primeira de um CNPJ já conhecido: o
+            # rótulo muda em linhas antigas, então refaz rótulos e cubo inteiros
+            self.df = self._concatenar(novos)
+            self.build_cliente_labels()
+            if self.compacto:
+                self.df = self._compactar(self.df)
+            self._atualizar_disponiveis()
+            return
+
+        novos_cnpjs = primeiros[anteriores.isna()]
+        for d, c, e in zip(novos_cnpjs['cnpj_digits'], novos_cnpjs['cliente'], novos_cnpjs['estado_cliente']):
+            self.cnpj_label_map[d] = {'cliente': c, 'estado': e}
+        self._primeiras_datas = pd.concat([
+            self._primeiras_datas,
+            pd.Series(novos_cnpjs['data'].to_numpy(), index=novos_cnpjs['cnpj_digits'].to_numpy()),
+        ])
+        conhecidos = pd.DataFrame(
+            [(d, self.cnpj_label_map[d]['cliente'], self.cnpj_label_map[d]['estado']) for d in primeiros['cnpj_digits']],
+            columns=['cnpj_digits', 'cliente', 'estado_cliente'],
+        )
+        novos['cliente_label'] = self._rotulos_cliente(novos, conhecidos)
+        self.df = self._concatenar(novos)
+        self._ordenar_clientes()
+
+        # Cubo: agrega só as linhas novas e junta com as células existentes
+        cubo_novo = self._agregar_cubo(novos)
+        cubo_novo[['primeira', 'linha_pico']] += inicio
+        self.cubo = self._combinar_cubos(self.cubo, cubo_novo)
+        self._indexar_cubo()
+        if self.pis_recorrentes is not None:
+            novos_pis = novos.groupby(['ano', 'campanha', 'pi'], sort=False).size()
+            self._pis_por_celula = self._pis_por_celula.add(novos_pis, fill_value=0).astype(int)
+            self.pis_recorrentes = self._contar_pis_recorrentes(self._pis_por_celula)
+
+        self.available_years = sorted(set(self.available_years) | set(novos['ano'].unique().tolist()))
+        self.available_clientes = sorted(set(self.available_clientes) | set(novos['cliente_label'].dropna().unique().tolist()))
+        self.available_campanhas = sorted(set(self.available_campanhas) | set(novos['campanha'].dropna().unique().tolist()))
+
+    @classmethod
+    def _combinar_cubos(cls, antigo, novo):
+        """Juntar dois cubos com posições de linha globais, como se tivessem sido agregados juntos"""
+        cubo = pd.concat([antigo, novo], ignore_index=True)
+        for col in ('cliente_label', 'cnpj_digits', 'campanha', 'anomes'):
+            cubo[col] = cubo[col].astype(object)
+        # Pico da célula: maior máximo; em empate, a linha que vem antes no arquivo
+        cubo = cubo.sort_values(['maximo', 'linha_pico'], ascending=[False, True], kind='stable')
+        grupos = cubo.groupby(cls.CUBO_CHAVES, sort=False, dropna=False)
+        cubo = grupos.agg(
+            soma=('soma', 'sum'),
+            contagem=('contagem', 'sum'),
+            maximo=('maximo', 'first'),
+            primeira=('primeira', 'min'),
+            linha_pico=('linha_pico', 'first'),
+        )
+        cubo = cubo.reset_index().sort_values('primeira', kind='stable', ignore_index=True)
+        for col in ('cliente_label', 'cnpj_digits', 'campanha', 'anomes'):
+            cubo[col] = cubo[col].astype('category')
+        return cubo
+
+    # ==========================================================
+    # 🗂️ Cubo em arquivos .npy (memory-mapped) para outros processos
+    # ==========================================================
+    def salvar_cubo(self, pasta):
+        """Gravar o cubo em colunas .npy (categorias como códigos) mais um JSON de metadados"""
+        meta = {
+            'colunas': {},
+            'has_cnpj_data': self.has_cnpj_data,
+            'cnpj_label_map': [
+                [digits, info.get('cliente'), info.get('estado')]
+                for digits, info in self.cnpj_label_map.items()
+            ],
+            'pis_recorrentes': None if self.pis_recorrentes is None else [
+                [ano, campanha, n] for (ano, campanha), n in self.pis_recorrentes.items()
+            ],
+        }
+        for col in self.cubo.columns:
+            serie = self.cubo[col]
+            if isinstance(serie.dtype, pd.CategoricalDtype):
+                np.save(os.path.join(pasta, f"{col}.npy"), serie.cat.codes.to_numpy())
+                meta['colunas'][col] = [str(c) for c in serie.cat.categories]
+            else:
+                np.save(os.path.join(pasta, f"{col}.npy"), serie.to_numpy())
+                meta['colunas'][col] = None
+        with open(os.path.join(pasta, 'cubo.json'), 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+
+    @classmethod
+    def abrir_cubo(cls, pasta, top_clientes=TOP_CLIENTES_PADRAO):
+        """Dados só com o cubo gravado por `salvar_cubo`, com as colunas mapeadas em memória.
+
+        As colunas numéricas e os códigos das categóricas apontam para os
+        arquivos .npy (somente leitura), então os processos que abrem a mesma
+        pasta compartilham as páginas em vez de ter cada um sua cópia. Sem as
+        linhas brutas, a busca de CNPJ precisa conter dígitos.
+        """
+        with open(os.path.join(pasta, 'cubo.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+        dados = cls(top_clientes=top_clientes)
+        colunas = {}
+        for col, categorias in meta['colunas'].items():
+            arr = np.load(os.path.join(pasta, f"{col}.npy"), mmap_mode='r')
+            colunas[col] = arr if categorias is None else pd.Categorical.from_codes(arr, categorias)
+        # copy=False: sem isso o DataFrame copia cada memmap para a memória do processo
+        dados.cubo = pd.DataFrame(colunas, copy=False)
+        dados.has_cnpj_data = meta['has_cnpj_data']
+        dados.cnpj_label_map = {
+            digits: {'cliente': cliente, 'estado': estado}
+            for digits, cliente, estado in meta['cnpj_label_map']
+        }
+        dados.pis_recorrentes = None if meta['pis_recorrentes'] is None else {
+            (ano, campanha): n for ano, campanha, n in meta['pis_recorrentes']
+        }
+        dados._indexar_cubo()
+        return dados
+
+    def selecionar(self, ano='Todos', campanha='Todas', cnpj_input='', cnpj_exato=False):
+        """Células do cubo para os filtros dados, sem tocar na interface.
+
+        A busca de CNPJ é por trecho (a da caixa de busca); com `cnpj_exato`,
+        só o CNPJ com exatamente esses dígitos (relatório por CNPJ).
+        Devolve (SelecaoCubo, CNPJs encontrados, busca de CNPJ aplicada ou None).
+        """
+        cubo = self.cubo
+        if cnpj_input and getattr(self, 'has_cnpj_data', False):
+            normalized = self._only_digits(cnpj_input)
+            if normalized:
+                if cnpj_exato:
+                    cnpjs = [normalized] if normalized in self.idx_cnpj else []
+                else:
+                    cnpjs = self.indice_cnpj.buscar(normalized)
+                partes = [self.idx_cnpj[c] for c in cnpjs if c in self.idx_cnpj]
+                pos = np.sort(np.concatenate(partes)) if partes else np.empty(0, dtype=np.intp)
+                selecao = SelecaoCubo(cubo, pos)
+            else:
+                # Busca textual no CNPJ original: o cubo só guarda os dígitos
+                df = self.df[self.df['cnpj'].str.contains(cnpj_input, case=False, na=False)]
+                cnpjs = [c for c in df['cnpj_digits'].unique() if c]
+                selecao = SelecaoCubo(self._agregar_cubo(df))
+            return selecao, cnpjs, normalized or cnpj_input
+
+        vazio = np.empty(0, dtype=np.intp)
+        pos = None
+        if ano != 'Todos':
+            pos = self.idx_ano.get(int(ano), vazio)
+        if campanha != 'Todas':
+            pos_campanha = self.idx_campanha.get(campanha, vazio)
+            pos = pos_campanha if pos is None else np.intersect1d(pos, pos_campanha, assume_unique=True)
+
+        return SelecaoCubo(cubo, pos), [], None
+
+    # ==========================================================
+    # 🧠 Visões já calculadas (LRU por estado dos filtros)
+    # ==========================================================
+    CACHE_VISOES_BYTES = 64 * 1024 * 1024
+
+    def _chave_visao(self, ano, campanha, cnpj_input, cnpj_exato=False):
+        """Estado normalizado dos filtros; uma busca de CNPJ ignora ano e campanha, como em `selecionar`"""
+        if cnpj_input and getattr(self, 'has_cnpj_data', False):
+            digitos = self._only_digits(cnpj_input)
+            if digitos:
+                return ('cnpj_exato' if cnpj_exato else 'cnpj', digitos)
+            return ('texto', cnpj_input)
+        return (str(ano), str(campanha))
+
+    def _bytes_visao(self, visao):
+        """Estimativa dos bytes que a visão mantém vivos (arrays das séries de cada nível e a seleção)"""
+        total = 1024
+        selecao = visao['selecao']
+        if selecao.pos is not None:
+            total += selecao.pos.nbytes
+        if selecao.cubo is not self.cubo:
+            total += int(selecao.cubo.memory_usage(index=True).sum())
+        for series in visao.get('niveis', {}).values():
+            for cliente, resumo in series:
+                total += 256 + len(cliente)
+                total += sum(v.nbytes for v in resumo.values() if isinstance(v, np.ndarray))
+        total += sum(x.nbytes for x in visao.get('x_niveis', {}).values())
+        return total
+
+    @medido('calcular_visao')
+    def calcular_visao(self, ano='Todos', campanha='Todas', cnpj_input='', cnpj_exato=False):
+        """Filtro, séries por cliente e estatísticas para os filtros dados (sem Tk nem matplotlib).
+
+        Visões já vistas voltam do cache, que é trocado a cada novo cubo
+        (carga, recarga ou linhas anexadas).
+        """
+        visoes = getattr(self, '_visoes', None)
+        chave = self._chave_visao(ano, campanha, cnpj_input, cnpj_exato)
+        visao = visoes.obter(chave) if visoes is not None else None
+        if visao is None:
+            visao = self._calcular_visao(ano, campanha, cnpj_input, cnpj_exato)
+            if visoes is not None:
+                visoes.guardar(chave, visao, self._bytes_visao(visao))
+        # Cópia rasa: quem recebe pode acrescentar chaves sem mexer no cache
+        return dict(visao)
+
+    def _calcular_visao(self, ano, campanha, cnpj_input, cnpj_exato=False):
+        selecao, cnpjs, busca = self.selecionar(ano, campanha, cnpj_input, cnpj_exato)
+        visao = {
+            'selecao': selecao,
+            'cnpjs_encontrados': cnpjs,
+            'busca_cnpj': busca,
+            'series': [],
+        }
+        if selecao.empty:
+            return visao
+
+        # 📌 Estatística opcional de PIs recorrentes (não filtra mais os dados)
+        if self.pis_recorrentes is not None:
+            visao['pis_recor'] = 0 if busca is not None else self._pis_recorrentes(ano, campanha)
+        else:
+            visao['pis_recor'] = 0
+            print("Coluna 'pi' não encontrada — exibindo todos os registros.")
+
+        # 🎨 Cores por cliente/CNPJ agrupado
+        series = self._series_por_cliente(selecao)
+        series = self._agrupar_outros(series, self.top_clientes)
+        cmap = plt.get_cmap('tab20')
+        cores = [cmap(i % 20) for i in range(len(series))]
+        if self.top_clientes and len(series) > self.top_clientes:
+            cores[-1] = self.COR_OUTROS
+
+        niveis = self._agregar_periodos(series)
+        visao.update(
+            series=series,
+            cores=cores,
+            niveis=niveis,
+            x_niveis=self._x_niveis(niveis),
+            estatisticas=self._estatisticas(selecao),
+        )
+        return visao
+
+    def cnpjs_do_cliente(self, rotulo):
+        """CNPJs (formatados) das células do cubo com o rótulo `rotulo`; vazio para 'Outros'"""
+        if getattr(self, '_cnpjs_por_rotulo', None) is None:
+            pares = self.cubo[['cliente_label', 'cnpj_digits']].drop_duplicates()
+            self._cnpjs_por_rotulo = {
+                str(rotulo): sorted(d for d in grupo if d)
+                for rotulo, grupo in pares.groupby('cliente_label', sort=False, observed=True)['cnpj_digits']
+            }
+        return [self._format_cnpj(d) for d in self._cnpjs_por_rotulo.get(rotulo, [])]
+
+    @staticmethod
+    def titulo_visao(visao):
+        if visao['busca_cnpj'] is not None:
+            return f"Campanhas vinculadas ao CNPJ {visao['busca_cnpj'] or '(informado)'}"
+        return f"Desempenho de Clientes com PIs Recorrentes (Total de {visao['pis_recor']} PIs)"
+
+    @staticmethod
+    def texto_estatisticas(visao):
+        total, media, pico, mes_pico = visao['estatisticas']
+        return f"Total: R$ {total:,.0f} | Média: R$ {media:,.0f} | Pico: R$ {pico:,.0f} ({mes_pico})"
+
+    def plotar_visao(self, ax, visao, granularidade=None):
+        """Desenhar as séries da visão em `ax` (sem legenda); devolve a LineCollection e o scatter com todos os pontos.
+
+        Sem `granularidade`, ela é escolhida pela faixa completa de meses da visão.
+        """
+        if granularidade is None:
+            granularidade = self.escolher_granularidade(visao, *self.faixa_visao(visao))
+        segmentos, offsets, cores_pontos = self._dados_nivel(visao, granularidade)
+
+        # 📊 Todas as linhas numa LineCollection e todas as bolinhas num único scatter
+        linhas = ax.add_collection(LineCollection(
+            segmentos,
+            colors=visao['cores'],
+            linewidths=2,
+            alpha=0.8
+        ))
+        pontos = ax.scatter(
+            offsets[:, 0],
+            offsets[:, 1],
+            s=100,
+            c=cores_pontos,
+            edgecolor='black',
+            alpha=0.9
+        )
+        ax.autoscale_view()
+
+        # 🏷️ Título dinâmico
+        ax.set_title(self.titulo_visao(visao), fontsize=14, fontweight='bold', pad=25)
+
+        ax.set_xlabel(self.NOME_PERIODO[granularidade])
+        ax.set_ylabel("Valor (R$)")
+        ax.grid(True, linestyle='--', alpha=0.3)
+        marcas = MarcasPeriodo(granularidade)
+        ax.xaxis.set_major_locator(marcas)
+        ax.xaxis.set_major_formatter(mticker.FuncFormatter(marcas.formatar))
+        ax.tick_params(axis='x', labelrotation=45)
+        ax.yaxis.set_major_formatter(mticker.FuncFormatter(lambda x, _: f"R$ {x:,.0f}"))
+        return linhas, pontos
+
+    # ==========================================================
+    # 🗓️ Eixo de tempo: meses desde o ano 0, somados por mês, trimestre ou ano
+    # ==========================================================
+    MESES_POR_PERIODO = {'mes': 1, 'trimestre': 3, 'ano': 12}
+    NOME_PERIODO = {'mes': 'Mês', 'trimestre': 'Trimestre', 'ano': 'Ano'}
+    # Granularidade mais fina cuja faixa visível tenha no máximo tantos períodos e pontos
+    PERIODOS_VISIVEIS_MAX = 72
+    PONTOS_VISIVEIS_MAX = 3000
+
+    def _agregar_periodos(self, series):
+        """Séries mensais (`x` = meses desde o ano 0) e as mesmas somadas por trimestre e por ano.
+
+        Cada nível é uma lista de (cliente, {'x', 'valor'}) na ordem das séries,
+        com `x` no centro do período; o nível 'mes' são as próprias séries.
+        """
+        meses, ids = np.unique(np.concatenate([resumo['anomes'] for _, resumo in series]), return_inverse=True)
+        ordinais = np.array([int(m[:4]) * 12 + int(m[5:7]) - 1 for m in meses], dtype=np.int64)
+        tamanhos = [len(resumo['anomes']) for _, resumo in series]
+        mes_x = ordinais[ids]
+        valores = np.concatenate([resumo['valor'] for _, resumo in series])
+        serie_id = np.repeat(np.arange(len(series), dtype=np.int64), tamanhos)
+
+        for (_, resumo), x in zip(series, np.split(mes_x, np.cumsum(tamanhos)[:-1])):
+            resumo['x'] = x
+        niveis = {'mes': series}
+        for nivel in ('trimestre', 'ano'):
+            n = self.MESES_POR_PERIODO[nivel]
+            # Meses já vêm em ordem dentro de cada série: cada período é uma faixa contígua
+            chave = serie_id * (1 << 32) + mes_x // n
+            inicios = np.flatnonzero(np.r_[True, chave[1:] != chave[:-1]])
+            somas = np.add.reduceat(valores, inicios)
+            xs = (mes_x[inicios] // n) * n + (n - 1) / 2
+            cortes = np.searchsorted(serie_id[inicios], np.arange(1, len(series)))
+            niveis[nivel] = [
+                (cliente, {'x': x, 'valor': v})
+                for (cliente, _), x, v in zip(series, np.split(xs, cortes), np.split(somas, cortes))
+            ]
+        return niveis
+
+    @staticmethod
+    def faixa_visao(visao):
+        """Faixa completa do eixo de tempo da visão (do primeiro ao último mês)"""
+        x_mes = visao['x_niveis']['mes']
+        return x_mes[0] - 0.5, x_mes[-1] + 0.5
+
+    @staticmethod
+    def _dados_nivel(visao, granularidade):
+        """Segmentos das linhas, posições e cores das bolinhas das séries no nível `granularidade`"""
+        series = visao['niveis'][granularidade]
+        tamanhos = [len(resumo['x']) for _, resumo in series]
+        segmentos = [np.column_stack([resumo['x'], resumo['valor']]) for _, resumo in series]
+        cores_pontos = np.repeat(np.array(visao['cores']), tamanhos, axis=0)
+        return segmentos, np.concatenate(segmentos), cores_pontos
+
+    @staticmethod
+    def _x_niveis(niveis):
+        # Posições de todos os pontos de cada nível, ordenadas, para contar os visíveis
+        return {nivel: np.sort(np.concatenate([r['x'] for _, r in lista])) for nivel, lista in niveis.items()}
+
+    def escolher_granularidade(self, visao, x0, x1):
+        """Granularidade para a faixa [x0, x1] do eixo de tempo, pelo número de períodos e de pontos visíveis"""
+        x0, x1 = sorted((x0, x1))
+        for nivel, n in self.MESES_POR_PERIODO.items():
+            x_nivel = visao['x_niveis'][nivel]
+            pontos = np.searchsorted(x_nivel, x1, side='right') - np.searchsorted(x_nivel, x0, side='left')
+            if (x1 - x0) / n <= self.PERIODOS_VISIVEIS_MAX and pontos <= self.PONTOS_VISIVEIS_MAX:
+                return nivel
+        return 'ano'
+
+    @classmethod
+    def rotulo_periodo(cls, x, granularidade):
+        """'2024-03', '2024-T1' ou '2024' para a posição `x` (centro do período) no eixo de tempo"""
+        n = cls.MESES_POR_PERIODO[granularidade]
+        ano, mes = divmod(int(round(x - (n - 1) / 2)), 12)
+        if granularidade == 'ano':
+            return f"{ano}"
+        if granularidade == 'trimestre':
+            return f"{ano}-T{mes // 3 + 1}"
+        return f"{ano}-{mes + 1:02d}"
+
+    # ==========================================================
+    # 🌐 Dados e visões em JSON (servidor de consultas)
+    # ==========================================================
+    def _coluna_chave_tabela(self):
+        """Coluna do cubo que identifica uma linha da tabela: o CNPJ ou, sem CNPJs, o rótulo do cliente"""
+        return 'cnpj_digits' if getattr(self, 'cliente_label_order', []) else 'cliente_label'
+
+    def linhas_tabela(self):
+        """Colunas da tabela de clientes (chave, CNPJ em dígitos, cliente, UF, total), na ordem do nome do cliente"""
+        source = getattr(self, 'cliente_label_order', [])
+        if source:
+            digits, clientes, estados = (np.array(col, dtype=object) for col in zip(*source))
+            chaves = digits
+        else:
+            # Sem CNPJ: um registro por rótulo de cliente, com o nome e a UF da primeira linha
+            distintos = self.df[['cliente_label', 'cnpj_digits', 'cliente', 'estado_cliente']].drop_duplicates('cliente_label')
+            distintos = distintos.sort_values('cliente', key=lambda c: c.str.lower(), kind='stable')
+            chaves, digits, clientes, estados = (distintos[c].to_numpy(dtype=object) for c in distintos.columns)
+
+        totais = self.cubo.groupby(self._coluna_chave_tabela(), observed=True)['soma'].sum()
+        return (
+            chaves,
+            digits,
+            pd.Series(clientes, dtype=object).fillna('').replace('', 'Desconhecido').to_numpy(dtype=object),
+            pd.Series(estados, dtype=object).fillna('').str.upper().to_numpy(dtype=object),
+            totais.reindex(chaves).fillna(0.0).to_numpy() if len(chaves) else np.empty(0),
+        )
+
+    def chaves_da_selecao(self, selecao):
+        """Chaves da tabela (CNPJs ou rótulos de cliente) presentes na seleção; None quando ela é o cubo inteiro"""
+        if selecao.pos is None and selecao.cubo is self.cubo:
+            return None
+        coluna = self._coluna_chave_tabela()
+        return selecao.categorias(coluna)[np.unique(selecao.codigos(coluna))].to_numpy(dtype=object)
+
+    def info_json(self):
+        return {
+            'linhas': int(len(self.df)),
+            'anos': [int(a) for a in self.available_years],
+            'campanhas': [str(c) for c in self.available_campanhas],
+            'has_cnpj_data': bool(getattr(self, 'has_cnpj_data', False)),
+            'top_clientes': self.top_clientes,
+            'descartadas': self.texto_descartadas(),
+        }
+
+    def tabela_json(self):
+        chaves, digits, clientes, estados, totais = self.linhas_tabela()
+        return {
+            'chave': [str(c) for c in chaves],
+            'cnpj': [str(d) for d in digits],
+            'cliente': [str(c) for c in clientes],
+            'estado': [str(e) for e in estados],
+            'total': totais.tolist(),
+        }
+
+    def visao_json(self, visao):
+        """Visão (de `calcular_visao`) em tipos JSON: séries de cada nível, cores, estatísticas e chaves da seleção"""
+        chaves = self.chaves_da_selecao(visao['selecao'])
+        corpo = {
+            'busca_cnpj': visao['busca_cnpj'],
+            'cnpjs_encontrados': [str(c) for c in visao['cnpjs_encontrados']],
+            'chaves_selecao': None if chaves is None else [str(c) for c in chaves],
+            'series': [],
+        }
+        if not visao['series']:
+            return corpo
+        total, media, pico, mes_pico = visao['estatisticas']
+        niveis = visao['niveis']
+        corpo.update(
+            pis_recor=int(visao['pis_recor']),
+            cores=[[float(c) for c in cor] for cor in visao['cores']],
+            estatisticas=[float(total), float(media), float(pico), str(mes_pico)],
+            series=[
+                {
+                    'cliente': str(cliente),
+                    'cnpjs': self.cnpjs_do_cliente(cliente),
+                    'anomes': [str(m) for m in resumo['anomes']],
+                    'niveis': {nivel: [lista[i][1]['x'].tolist(), lista[i][1]['valor'].tolist()] for nivel, lista in niveis.items()},
+                }
+                for i, (cliente, resumo) in enumerate(visao['series'])
+            ],
+        )
+        return corpo
+
+    @classmethod
+    def visao_de_json(cls, corpo):
+        """Inverso de `visao_json`; sem 'selecao' (as chaves da tabela na seleção vêm em 'chaves_selecao')"""
+        visao = {
+            'selecao': None,
+            'busca_cnpj': corpo['busca_cnpj'],
+            'cnpjs_encontrados': corpo['cnpjs_encontrados'],
+            'chaves_selecao': corpo['chaves_selecao'],
+            'series': [],
+        }
+        if not corpo['series']:
+            return visao
+        niveis = {nivel: [] for nivel in cls.MESES_POR_PERIODO}
+        for serie in corpo['series']:
+            for nivel, (x, valor) in serie['niveis'].items():
+                resumo = {'x': np.asarray(x), 'valor': np.asarray(valor, dtype=float)}
+                if nivel == 'mes':
+                    resumo['anomes'] = np.array(serie['anomes'], dtype=object)
+                niveis[nivel].append((serie['cliente'], resumo))
+        visao.update(
+            series=niveis['mes'],
+            niveis=niveis,
+            x_niveis=cls._x_niveis(niveis),
+            cores=[tuple(cor) for cor in corpo['cores']],
+            estatisticas=tuple(corpo['estatisticas']),
+            pis_recor=corpo['pis_recor'],
+        )
+        return visao
+
+
+class PowerBIInterativo(DadosBI):
+    # Entradas da legenda por página (a roda do mouse sobre a legenda troca de página)
+    LEGENDA_POR_PAGINA = 30
+    # Distância máxima (pontos tipográficos) entre o mouse e a bolinha para clique/dica
+    RAIO_TOQUE_PT = 8
+    # Intervalo mínimo entre atualizações da dica ao mover o mouse
+    HOVER_INTERVALO_MS = 50
+    # Tamanho da fonte dos valores sobre a série destacada
+    ROTULO_FONTE = 8
+    # ClienteBI quando os dados vêm de um servidor de consultas (--servidor) em vez do CSV
+    servidor = None
+
+    def __init__(self, root, source_file=None, usar_cache=True, recriar_cache=False, top_clientes=DadosBI.TOP_CLIENTES_PADRAO,
+                 observar=None, processos=None, compacto=False, relatorio_memoria=False, mostrar_latencia=False,
+                 servidor=None):
+        super().__init__(top_clientes=top_clientes, compacto=compacto, relatorio_memoria=relatorio_memoria)
+        self.root = root
+        self.root.title("Power BI em Python - Relatório Interativo")
+        self.root.geometry("1500x900")
+        self.source_file = source_file
+        self.usar_cache = usar_cache
+        # Intervalo (s) entre verificações de linhas novas no CSV; None = não observar
+        self.observar = observar
+        self._status_dados = None
+        self.cnpj_filtered = False
+        self.last_cnpj_search = ""
+        self.clientes_tree = None
+        self.cnpjs_encontrados = []
+        self._busca_cnpj_agendada = None
+        self._pagina_legenda = 0
+        self._geracao_visao = 0
+        self._calculo_pendente = None
+        # Barra de status com o tempo de cada parte da última interação
+        self.mostrar_latencia = mostrar_latencia
+        self._interacao_pendente = None
+        # Índice dos pontos na tela (refeito a cada desenho) e estado da dica do mouse
+        self._indice_pontos = None
+        self._hover_agendado = None
+        self._hover_evento = None
+        self._ponto_dica = None
+
+        self.setup_styles()
+        # A janela aparece já com a barra de status; a carga roda em segundo plano
+        self.status_var = tk.StringVar(value="")
+        ttk.Label(self.root, textvariable=self.status_var, anchor='w').pack(side=tk.BOTTOM, fill=tk.X, padx=10, pady=(0, 5))
+        self.trabalhador = Trabalhador(root)
+        self.ao_progresso = lambda texto: self.trabalhador.notificar(self._mostrar_status, texto)
+        self.root.protocol('WM_DELETE_WINDOW', self.fechar)
+
+        if servidor:
+            self.servidor = ClienteBI(servidor)
+            self._mostrar_status(f"Conectando a {self.servidor.url}...")
+            self.trabalhador.submeter(self.conectar, lambda _: self._dados_carregados(), self._erro_carregamento)
+            return
+
+        if not source_file:
+            messagebox.showerror("Erro", "Nenhum arquivo CSV informado.")
+            self.fechar()
+            return
+
+        if isinstance(source_file, (list, tuple)):
+            self._mostrar_status(f"Carregando {len(source_file)} arquivos...")
+        else:
+            self._mostrar_status(f"Carregando {os.path.basename(source_file)}...")
+        self.trabalhador.submeter(
+            lambda: self.load_data(source_file, usar_cache=usar_cache, recriar_cache=recriar_cache, processos=processos),
+            lambda _: self._dados_carregados(),
+            self._erro_carregamento,
+        )
+
+    def conectar(self):
+        """No lugar de load_data: anos, campanhas e tabela de clientes lidos do servidor de consultas"""
+        info = self.servidor.obter('/info')
+        self.available_years = info['anos']
+        self.available_campanhas = info['campanhas']
+        self.has_cnpj_data = info['has_cnpj_data']
+        self.top_clientes = info['top_clientes']
+        tabela = self.servidor.obter('/clientes')
+        self._tabela_remota = (
+            np.array(tabela['chave'], dtype=object),
+            np.array(tabela['cnpj'], dtype=object),
+            np.array(tabela['cliente'], dtype=object),
+            np.array(tabela['estado'], dtype=object),
+            np.array(tabela['total'], dtype=float),
+        )
+        self._cnpjs_remotos = {}
+        self._status_dados = f"{info['linhas']:,} linhas no servidor {self.servidor.url}. {info['descartadas']}".strip()
+
+    def _dados_carregados(self):
+        descartadas = self.texto_descartadas()
+        if descartadas:
+            self._status_dados = f"{len(self.df):,} linhas carregadas. {descartadas}"
+        try:
+            self.setup_ui()
+        except Exception as e:
+            self._erro_carregamento(e)
+            return
+        if self.observar:
+            self.root.after(int(self.observar * 1000), self._verificar_arquivo)
+
+    # ==========================================================
+    # 👀 Observar o CSV e anexar as linhas novas
+    # ==========================================================
+    def _verificar_arquivo(self):
+        self.trabalhador.submeter(
+            lambda: self.atualizar_arquivo(self.source_file, usar_cache=self.usar_cache),
+            self._arquivo_atualizado,
+            self._erro_observacao,
+        )
+
+    def _proxima_verificacao(self):
+        if not self.trabalhador.encerrado:
+            self.root.after(int(self.observar * 1000), self._verificar_arquivo)
+
+    def _erro_observacao(self, erro):
+        self._mostrar_status(f"Erro ao ler linhas novas: {erro}")
+        self._proxima_verificacao()
+
+    def _arquivo_atualizado(self, resultado):
+        situacao, linhas = resultado
+        if situacao != 'igual':
+            self.ano_combo['values'] = ['Todos'] + [str(a) for a in self.available_years]
+            self.campanha_combo['values'] = ['Todas'] + self.available_campanhas
+            # Repreparar a tabela mantendo a ordenação escolhida
+            ordem = self._tabela_ordem
+            self.populate_client_table()
+            self._tabela_ordem = ordem
+            self.update_plot()
+            texto = "CSV reescrito — dados recarregados" if situacao == 'recarregado' else f"{linhas:,} linhas novas"
+            self._status_dados = f"{texto} ({len(self.df):,} no total). {self.texto_descartadas()}".strip()
+        self._proxima_verificacao()
+
+    def _erro_carregamento(self, erro):
+        messagebox.showerror("Erro", f"Erro ao carregar dados: {str(erro)}")
+        self.fechar()
+
+    def _mostrar_status(self, texto):
+        self.status_var.set(texto)
+
+    def fechar(self):
+        self.trabalhador.encerrar()
+        self.root.destroy()
+
     def setup_styles(self):
         style = ttk.Style()
         style.theme_use('clam')
@@ -209,8 +2058,9 @@ class PowerBIInterativo:
         if entry_state == 'disabled':
             self.cnpj_var.set("CNPJ não disponível")
         else:
-            self.cnpj_entry.bind('<Return>', lambda e: self.update_plot())
-            self.cnpj_entry.bind('<FocusOut>', lambda e: self.update_plot())
+            self.cnpj_entry.bind('<Return>', lambda e: self._aplicar_busca_cnpj(forcar=True))
+            self.cnpj_entry.bind('<FocusOut>', lambda e: self._aplicar_busca_cnpj())
+            self.cnpj_entry.bind('<KeyRelease>', self._agendar_busca_cnpj)
 
         ttk.Label(control_frame, text="Campanha:", style='Header.TLabel').pack(side=tk.LEFT, padx=(0, 5))
         self.campanha_var = tk.StringVar(value='Todas')
@@ -237,289 +2087,1078 @@ class PowerBIInterativo:
         self.plot_frame.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         self.create_plot()
 
+    # ==========================================================
+    # 📋 Tabela de clientes virtualizada
+    # ==========================================================
+    # Linhas extras além das que cabem na altura da tabela (última linha cortada, resize)
+    TABELA_BUFFER = 5
+
     def setup_client_table(self):
         if not hasattr(self, 'clientes_frame'):
             return
 
-        columns = ('cliente', 'estado', 'cnpj')
+        columns = ('cliente', 'estado', 'cnpj', 'total')
         self.clientes_tree = ttk.Treeview(
             self.clientes_frame,
             columns=columns,
             show='headings',
-            height=20
+            height=20,
+            selectmode='browse'
         )
-        self.clientes_tree.heading('cliente', text='Cliente')
-        self.clientes_tree.heading('estado', text='UF')
-        self.clientes_tree.heading('cnpj', text='CNPJ')
-        self.clientes_tree.column('cliente', width=220, anchor='w')
+        for col, texto in zip(columns, ('Cliente', 'UF', 'CNPJ', 'Total')):
+            self.clientes_tree.heading(col, text=texto, command=lambda c=col: self.ordenar_tabela(c))
+        self.clientes_tree.column('cliente', width=160, anchor='w')
         self.clientes_tree.column('estado', width=40, anchor='center')
-        self.clientes_tree.column('cnpj', width=150, anchor='center')
+        self.clientes_tree.column('cnpj', width=130, anchor='center')
+        self.clientes_tree.column('total', width=100, anchor='e')
 
-        y_scroll = ttk.Scrollbar(self.clientes_frame, orient=tk.VERTICAL, command=self.clientes_tree.yview)
-        y_scroll.pack(side=tk.RIGHT, fill=tk.Y)
+        # A barra vertical percorre a lista inteira; a Treeview só tem as linhas visíveis
+        self._tabela_scroll = ttk.Scrollbar(self.clientes_frame, orient=tk.VERTICAL, command=self._rolar_tabela)
+        self._tabela_scroll.pack(side=tk.RIGHT, fill=tk.Y)
         x_scroll = ttk.Scrollbar(self.clientes_frame, orient=tk.HORIZONTAL, command=self.clientes_tree.xview)
         x_scroll.pack(side=tk.BOTTOM, fill=tk.X)
 
-        self.clientes_tree.configure(yscrollcommand=y_scroll.set, xscrollcommand=x_scroll.set)
+        self.clientes_tree.configure(xscrollcommand=x_scroll.set)
+        self.clientes_tree.tag_configure('encontrado', background='#fff3b0')
         self.clientes_tree.pack(fill=tk.BOTH, expand=True)
+        self.clientes_tree.bind('<Configure>', self._on_resize_tabela)
+        self.clientes_tree.bind('<MouseWheel>', self._on_wheel_tabela)
+        self.clientes_tree.bind('<Button-4>', lambda e: self._rolar_tabela('scroll', -3, 'units'))
+        self.clientes_tree.bind('<Button-5>', lambda e: self._rolar_tabela('scroll', 3, 'units'))
+        self._tabela_itens = []
+        self._tabela_linhas_visiveis = 20
         self.populate_client_table()
 
     def populate_client_table(self):
+        """Preparar as colunas e as ordens da tabela; só as linhas visíveis viram itens da Treeview"""
         if not self.clientes_tree:
             return
-        for item in self.clientes_tree.get_children():
-            self.clientes_tree.delete(item)
 
-        source = getattr(self, 'cliente_label_order', [])
-        if not source:
-            source = [
-                (row.get('cnpj_digits', ''), row.get('cliente', 'Desconhecido'), row.get('estado_cliente', ''))
-                for _, row in self.df.iterrows()
-            ]
+        chaves, digits, clientes, estados, totais = self._tabela_remota if self.servidor is not None else self.linhas_tabela()
+        self._tabela = {'cliente': clientes, 'estado': estados, 'cnpj': digits, 'total': totais}
+        self._tabela_index = pd.Index(chaves)
+
+        # Ordens pré-calculadas; a origem já vem ordenada por nome do cliente
+        n = len(digits)
+        self._tabela_ordens = {
+            'cliente': np.arange(n),
+            'estado': np.argsort(self._tabela['estado'], kind='stable'),
+            'cnpj': np.argsort(digits, kind='stable'),
+            'total': np.argsort(-self._tabela['total'], kind='stable'),
+        }
+        self._tabela_ordem = ('cliente', False)
+        self._tabela_filtro = None
+        self._tabela_destaque = set()
+        self._tabela_offset = 0
+        self._atualizar_visao_tabela()
+
+    def _atualizar_visao_tabela(self):
+        coluna, desc = self._tabela_ordem
+        ordem = self._tabela_ordens[coluna]
+        if desc:
+            ordem = ordem[::-1]
+        if self._tabela_filtro is not None:
+            ordem = ordem[self._tabela_filtro[ordem]]
+        self._tabela_visao = ordem
+        self._render_tabela()
+
+    def _render_tabela(self):
+        """Reescrever os valores do pequeno conjunto de itens a partir da posição atual"""
+        tree = self.clientes_tree
+        total = len(self._tabela_visao)
+        janela = self._tabela_linhas_visiveis + self.TABELA_BUFFER
+        self._tabela_offset = max(0, min(self._tabela_offset, total - self._tabela_linhas_visiveis))
+
+        while len(self._tabela_itens) < janela:
+            self._tabela_itens.append(tree.insert('', tk.END, values=('', '', '', '')))
+        while len(self._tabela_itens) > janela:
+            tree.delete(self._tabela_itens.pop())
+
+        linhas = self._tabela_visao[self._tabela_offset:self._tabela_offset + janela]
+        t = self._tabela
+        for k, item in enumerate(self._tabela_itens):
+            if k < len(linhas):
+                i = linhas[k]
+                digits = t['cnpj'][i]
+                valores = (t['cliente'][i], t['estado'][i], self._format_cnpj(digits), f"R$ {t['total'][i]:,.0f}")
+                tags = ('encontrado',) if digits in self._tabela_destaque else ()
+            else:
+                valores, tags = ('', '', '', ''), ()
+            tree.item(item, values=valores, tags=tags)
+        tree.yview_moveto(0)
 
-        for digits, cliente, estado in source:
-            cliente = cliente or 'Desconhecido'
-            estado = (estado or '').upper()
-            cnpj_formatado = self._format_cnpj(digits)
-            self.clientes_tree.insert('', tk.END, values=(cliente, estado, cnpj_formatado))
+        if total:
+            self._tabela_scroll.set(self._tabela_offset / total, min(1.0, (self._tabela_offset + self._tabela_linhas_visiveis) / total))
+        else:
+            self._tabela_scroll.set(0, 1)
+
+    def _rolar_tabela(self, acao, quanto, unidade=None):
+        if acao == 'moveto':
+            self._tabela_offset = int(float(quanto) * len(self._tabela_visao))
+        else:
+            passo = self._tabela_linhas_visiveis if unidade == 'pages' else 1
+            self._tabela_offset += int(quanto) * passo
+        self._render_tabela()
+        return 'break'
+
+    def _on_wheel_tabela(self, event):
+        # Windows manda múltiplos de 120 por passo da roda; macOS manda valores pequenos
+        passos = -(event.delta // 120) or (-1 if event.delta > 0 else 1)
+        return self._rolar_tabela('scroll', 3 * passos, 'units')
+
+    def _on_resize_tabela(self, event):
+        altura_linha = int(ttk.Style().lookup('Treeview', 'rowheight') or 20)
+        # Descontar o cabeçalho (aproximadamente uma linha)
+        linhas = max(1, event.height // altura_linha - 1)
+        if linhas != self._tabela_linhas_visiveis:
+            self._tabela_linhas_visiveis = linhas
+            self._render_tabela()
+
+    def ordenar_tabela(self, coluna):
+        """Clique no cabeçalho: ordenar pela coluna (clicar de novo inverte)"""
+        atual, desc = self._tabela_ordem
+        self._tabela_ordem = (coluna, not desc if coluna == atual else False)
+        self._tabela_offset = 0
+        self._atualizar_visao_tabela()
+
+    def _filtro_tabela(self, chaves):
+        """Máscara das linhas da tabela com as chaves `chaves` (None = todas)"""
+        if chaves is None:
+            return None
+        linhas = self._tabela_index.get_indexer_for(chaves)
+        filtro = np.zeros(len(self._tabela_index), dtype=bool)
+        filtro[linhas[linhas >= 0]] = True
+        return filtro
 
     def create_plot(self):
+        """Figura, canvas e toolbar criados uma única vez; os eventos também são ligados só aqui"""
         self.fig, self.ax = plt.subplots(figsize=(14, 8))
+        self.canvas = FigureCanvasTkAgg(self.fig, master=self.plot_frame)
+        self.toolbar = NavigationToolbar2Tk(self.canvas, self.plot_frame)
+        self.toolbar.update()
+        self.canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+        self._conectar_eventos()
         self.update_plot()
 
-    def filtrar_dados(self):
-        df = self.df.copy()
+    def _conectar_eventos(self):
+        self._fundo = None
+        self._fundo_destaque = None
+        self._visao_desenhada = None
+        self._granularidade = None
+        self._reagregacao_agendada = None
+        self._arrastando = False
+        self._preparar_destaque()
+        self.canvas.mpl_connect('button_press_event', self.on_point_click)
+        self.canvas.mpl_connect('button_release_event', self._on_soltar)
+        self.canvas.mpl_connect('motion_notify_event', self._on_mover)
+        self.canvas.mpl_connect('draw_event', self._on_draw)
+        self.canvas.mpl_connect('scroll_event', self._on_scroll_legenda)
+
+    def _ler_filtros(self):
+        """Filtros atuais (ano, campanha, busca de CNPJ), lidos na thread do Tk.
+
+        Uma busca de CNPJ vale para todos os anos e campanhas, então volta as
+        duas caixas para 'Todos'/'Todas'.
+        """
         ano = self.ano_var.get()
-        cnpj_input = self.cnpj_var.get().strip() if hasattr(self, 'cnpj_var') else ''
         campanha = self.campanha_var.get()
-        self.cnpj_filtered = False
-        self.last_cnpj_search = ""
-        aplicar_ano = True
-        aplicar_campanha = True
-
+        cnpj_input = self.cnpj_var.get().strip() if hasattr(self, 'cnpj_var') else ''
         if cnpj_input and getattr(self, 'has_cnpj_data', False):
-            normalized = self._only_digits(cnpj_input)
-            if normalized:
-                df = df[df['cnpj_digits'].str.contains(normalized, na=False)]
-            else:
-                df = df[df['cnpj'].str.contains(cnpj_input, case=False, na=False)]
-            self.cnpj_filtered = True
-            self.last_cnpj_search = normalized or cnpj_input
-            aplicar_ano = False
-            aplicar_campanha = False
+            ano, campanha = 'Todos', 'Todas'
             if self.ano_var.get() != 'Todos':
                 self.ano_var.set('Todos')
             if self.campanha_var.get() != 'Todas':
                 self.campanha_var.set('Todas')
+        return ano, campanha, cnpj_input
 
-        if aplicar_ano and ano != 'Todos':
-            df = df[df['ano'] == int(ano)]
-        if aplicar_campanha and campanha != 'Todas':
-            df = df[df['campanha'] == campanha]
+    def filtrar_dados(self):
+        """Células do cubo que atendem aos filtros de ano, campanha e CNPJ (SelecaoCubo)"""
+        selecao, self.cnpjs_encontrados, busca = self.selecionar(*self._ler_filtros())
+        self.cnpj_filtered = busca is not None
+        self.last_cnpj_search = busca or ""
+        return selecao
 
-        return df
+    # ==========================================================
+    # 🔎 Busca de CNPJ enquanto digita
+    # ==========================================================
+    def _agendar_busca_cnpj(self, event=None):
+        if event is not None and event.keysym in ('Return', 'Tab'):
+            return
+        if self._busca_cnpj_agendada is not None:
+            self.root.after_cancel(self._busca_cnpj_agendada)
+        self._busca_cnpj_agendada = self.root.after(300, self._aplicar_busca_cnpj)
+
+    def _aplicar_busca_cnpj(self, forcar=False):
+        if self._busca_cnpj_agendada is not None:
+            self.root.after_cancel(self._busca_cnpj_agendada)
+            self._busca_cnpj_agendada = None
+        busca = self.cnpj_var.get().strip()
+        if not forcar and busca == getattr(self, '_ultima_busca_cnpj', None):
+            return
+        self._ultima_busca_cnpj = busca
+        self.update_plot()
+
+    def destacar_clientes(self, cnpjs):
+        """Marcar na tabela de clientes as linhas dos CNPJs encontrados"""
+        if not self.clientes_tree:
+            return
+        self._tabela_destaque = set(cnpjs)
+        linhas = self._tabela_index.get_indexer_for(list(cnpjs)) if cnpjs else []
+        linhas = [l for l in linhas if l >= 0]
+        if linhas:
+            # Levar o primeiro encontrado para o topo da janela visível
+            posicoes = np.flatnonzero(np.isin(self._tabela_visao, linhas))
+            if len(posicoes):
+                self._tabela_offset = int(posicoes[0])
+        self._render_tabela()
 
     def update_plot(self):
-        df_plot = self.filtrar_dados()
+        """Recalcular a visão dos filtros atuais em segundo plano e desenhar quando ficar pronta.
+
+        Cada pedido ganha um número de geração: um pedido ainda na fila é
+        cancelado pelo seguinte, e um resultado que chega depois de um pedido
+        mais novo é descartado.
+        """
+        filtros = self._ler_filtros()
+        self._geracao_visao += 1
+        geracao = self._geracao_visao
+        interacao = self._iniciar_interacao('filtro', ano=filtros[0], campanha=filtros[1], cnpj=filtros[2])
+        trabalhador = getattr(self, 'trabalhador', None)
+        if trabalhador is None:
+            self._aplicar_visao(self._calcular_interacao(filtros, interacao), geracao, interacao)
+            return
+
+        if self._calculo_pendente is not None:
+            self._calculo_pendente.cancel()
+        self._mostrar_status("Filtrando...")
+        self._calculo_pendente = trabalhador.submeter(
+            lambda: self._calcular_interacao(filtros, interacao),
+            lambda visao: self._aplicar_visao(visao, geracao, interacao),
+            self._erro_calculo,
+        )
+
+    def _erro_calculo(self, erro):
+        self._mostrar_status(f"Erro ao filtrar: {erro}")
+
+    def calcular_visao(self, ano='Todos', campanha='Todas', cnpj_input=''):
+        if self.servidor is not None:
+            corpo = self.servidor.obter('/visao', ano=ano, campanha=campanha, cnpj=cnpj_input)
+            self._cnpjs_remotos.update((serie['cliente'], serie['cnpjs']) for serie in corpo['series'])
+            visao = self.visao_de_json(corpo)
+            chaves = visao['chaves_selecao']
+        else:
+            visao = super().calcular_visao(ano, campanha, cnpj_input)
+            chaves = self.chaves_da_selecao(visao['selecao'])
+        visao['filtro_tabela'] = self._filtro_tabela(chaves) if self.clientes_tree else None
+        return visao
+
+    def cnpjs_do_cliente(self, rotulo):
+        if self.servidor is not None:
+            return self._cnpjs_remotos.get(rotulo, [])
+        return super().cnpjs_do_cliente(rotulo)
+
+    def _aplicar_visao(self, visao, geracao, interacao=None):
+        if geracao != self._geracao_visao:
+            return
+        self._calculo_pendente = None
+        self.cnpjs_encontrados = visao['cnpjs_encontrados']
+        self.cnpj_filtered = visao['busca_cnpj'] is not None
+        self.last_cnpj_search = visao['busca_cnpj'] or ""
+        if self.clientes_tree:
+            self._tabela_filtro = visao['filtro_tabela']
+            self._atualizar_visao_tabela()
+        self.destacar_clientes(self.cnpjs_encontrados)
+        if getattr(self, 'trabalhador', None) is not None:
+            self._mostrar_status(self._status_dados or f"{len(self.df):,} linhas carregadas.")
+        if interacao is not None:
+            interacao['inicio_desenho'] = time.perf_counter()
+            self._interacao_pendente = interacao
+        self.desenhar_visao(visao)
+
+    @medido('desenhar_visao')
+    def desenhar_visao(self, visao):
         self.ax.clear()
+        self._preparar_destaque()
 
-        if df_plot.empty:
+        series = visao['series']
+        self._visao_desenhada = None
+        if not series:
+            self.series_plotadas = []
+            self._pontos_series = None
             self.ax.text(0.5, 0.5, "Sem dados para exibir", ha='center', va='center', fontsize=14, color='gray')
             self.redraw()
             return
 
-        # 📌 Estatística opcional de PIs recorrentes (não filtra mais os dados)
-        cnpj_filtered = getattr(self, 'cnpj_filtered', False)
-        if 'pi' in df_plot.columns:
-            recorrentes = df_plot['pi'].value_counts()
-            pis_recor = recorrentes[recorrentes >= 2].index.tolist()
-        else:
-            pis_recor = []
-            print("Coluna 'pi' não encontrada — exibindo todos os registros.")
-
-        # 🎨 Cores por cliente/CNPJ agrupado
-        if 'cliente_label' not in df_plot.columns:
-            df_plot['cliente_label'] = df_plot['cliente']
-        clientes_unicos = df_plot['cliente_label'].unique().tolist()
-        cmap = plt.get_cmap('tab20')
-        cores = {cliente: cmap(i % 20) for i, cliente in enumerate(clientes_unicos)}
+        granularidade = self.escolher_granularidade(visao, *self.faixa_visao(visao))
+        self._linhas_series, self._pontos_series = self.plotar_visao(self.ax, visao, granularidade)
+        self._visao_desenhada = visao
+        self._cores_series = visao['cores']
+        self._usar_nivel(granularidade)
+        # ax.clear() troca o registro de callbacks dos eixos: reconectar a cada desenho
+        self.ax.callbacks.connect('xlim_changed', self._on_xlim)
 
-        # Guardar info para clique
-        self.scatter_data = []
-        self.text_labels = []
+        self._pagina_legenda = 0
+        self._desenhar_legenda()
+        self.fig.subplots_adjust(right=0.78)
 
-        # 📊 Plotar linhas e bolinhas por cliente
-        for cliente in clientes_unicos:
-            df_cliente = df_plot[df_plot['cliente_label'] == cliente]
-            resumo = df_cliente.groupby('anomes')['valor'].sum().reset_index()
-
-            linha, = self.ax.plot(
-                resumo['anomes'],
-                resumo['valor'],
-                marker='o',
-                linestyle='-',
-                linewidth=2,
-                color=cores[cliente],
-                alpha=0.8,
-                label=cliente
-            )
+        # 🧮 Estatísticas gerais
+        self.stats_label.config(text=self.texto_estatisticas(visao))
 
-            pontos = self.ax.scatter(
-                resumo['anomes'],
-                resumo['valor'],
-                s=100,
-                color=cores[cliente],
-                edgecolor='black',
-                alpha=0.9,
-                picker=True  # 🔹 habilita clique
-            )
+        self.redraw()
 
-            self.scatter_data.append((pontos, linha, cliente, resumo))
+    def _usar_nivel(self, granularidade):
+        """Séries do nível desenhado e, para clique e dica, o índice da série de cada ponto do scatter"""
+        self._granularidade = granularidade
+        self.series_plotadas = self._visao_desenhada['niveis'][granularidade]
+        self._serie_do_ponto = np.repeat(
+            np.arange(len(self.series_plotadas)), [len(resumo['x']) for _, resumo in self.series_plotadas]
+        )
 
-        # 🧮 Estatísticas gerais
-        total = df_plot['valor'].sum()
-        media = df_plot['valor'].mean()
-        pico = df_plot['valor'].max()
-        mes_pico = df_plot.loc[df_plot['valor'].idxmax(), 'anomes']
+    # ==========================================================
+    # 🗓️ Zoom e pan: reagregar por mês, trimestre ou ano
+    # ==========================================================
+    def _on_xlim(self, _ax):
+        """Faixa de tempo mudou (zoom, pan, home): reavaliar a granularidade depois que a toolbar terminar.
 
-        # 🏷️ Título dinâmico
-        if cnpj_filtered:
-            cnpj_info = getattr(self, 'last_cnpj_search', '')
-            titulo = f"Campanhas vinculadas ao CNPJ {cnpj_info or '(informado)'}"
-        else:
-            titulo = f"Desempenho de Clientes com PIs Recorrentes (Total de {len(pis_recor)} PIs)"
-        self.ax.set_title(titulo, fontsize=14, fontweight='bold', pad=25)
+        A toolbar ajusta o eixo y logo após o x; adiar para o próximo ocioso do
+        Tk deixa a escala de y reagregada valer sobre a dela.
+        """
+        if self._reagregacao_agendada is not None:
+            return
+        root = getattr(self, 'root', None)
+        if root is None:
+            self._reagregar()
+            return
+        self._reagregacao_agendada = root.after_idle(self._reagregar)
+
+    def _on_soltar(self, event):
+        if self._arrastando:
+            self._arrastando = False
+            self._on_xlim(self.ax)
+
+    def _reagregar(self):
+        self._reagregacao_agendada = None
+        visao = self._visao_desenhada
+        # Durante o arraste do pan a toolbar recalcula os limites a partir do início; reagrega ao soltar
+        if visao is None or self._arrastando:
+            return
+        granularidade = self.escolher_granularidade(visao, *self.ax.get_xlim())
+        if granularidade == self._granularidade:
+            return
 
-        # Limpar texto de cliente ativo
-        if hasattr(self, "cliente_texto") and self.cliente_texto is not None:
-            try:
-                self.cliente_texto.remove()
-            except Exception:
-                pass
-        self.cliente_texto = None
+        interacao = self._iniciar_interacao('granularidade', granularidade=granularidade)
+        segmentos, offsets, cores_pontos = self._dados_nivel(visao, granularidade)
+        self._linhas_series.set_segments(segmentos)
+        self._pontos_series.set_offsets(offsets)
+        self._pontos_series.set_facecolor(cores_pontos)
+        self._usar_nivel(granularidade)
+        self.ax.xaxis.get_major_locator().granularidade = granularidade
+        self.ax.set_xlabel(self.NOME_PERIODO[granularidade])
+
+        # Somas por ano são muito maiores que por mês: reajustar y aos pontos visíveis
+        x0, x1 = sorted(self.ax.get_xlim())
+        visiveis = offsets[(offsets[:, 0] >= x0) & (offsets[:, 0] <= x1), 1]
+        if len(visiveis):
+            baixo, alto = min(visiveis.min(), 0), visiveis.max()
+            margem = (alto - baixo) * 0.05 or 1
+            self.ax.set_ylim(baixo - margem, alto + margem)
+
+        # Destaque e dica apontavam para os pontos do nível anterior
+        self._dica.set_visible(False)
+        self._ponto_dica = None
+        if self._destaque_ativo:
+            self._montar_destaque(self._serie_destacada)
+        interacao['inicio_desenho'] = time.perf_counter()
+        interacao['partes']['reagregar'] = (interacao['inicio_desenho'] - interacao['inicio']) * 1000
+        self._interacao_pendente = interacao
+        self.redraw()
 
-        self.ax.set_xlabel("Mês")
-        self.ax.set_ylabel("Valor (R$)")
-        self.ax.grid(True, linestyle='--', alpha=0.3)
-        plt.xticks(rotation=45)
-        self.ax.yaxis.set_major_formatter(mticker.FuncFormatter(lambda x, _: f"R$ {x:,.0f}"))
+    # ==========================================================
+    # 📜 Legenda paginada (roda do mouse sobre a legenda)
+    # ==========================================================
+    def _desenhar_legenda(self):
+        series = self.series_plotadas
+        por_pagina = self.LEGENDA_POR_PAGINA
+        paginas = max(1, -(-len(series) // por_pagina))
+        self._pagina_legenda = min(max(self._pagina_legenda, 0), paginas - 1)
+        inicio = self._pagina_legenda * por_pagina
+        fim = min(inicio + por_pagina, len(series))
+
+        handles = [
+            Line2D([], [], color=cor, marker='o', linewidth=2, markeredgecolor='black')
+            for cor in self._cores_series[inicio:fim]
+        ]
+        titulo = "Cliente"
+        if paginas > 1:
+            titulo = f"Cliente ({inicio + 1}-{fim} de {len(series)}, role para ver mais)"
 
+        if self.ax.get_legend() is not None:
+            self.ax.get_legend().remove()
         legend = self.ax.legend(
-            title="Cliente",
+            handles,
+            [cliente for cliente, _ in series[inicio:fim]],
+            title=titulo,
             bbox_to_anchor=(1.02, 1),
             loc='upper left',
             borderaxespad=0,
             fontsize=9
         )
         legend.get_title().set_fontsize('10')
-        self.fig.subplots_adjust(right=0.78)
-
-        self.stats_label.config(
-            text=f"Total: R$ {total:,.0f} | Média: R$ {media:,.0f} | Pico: R$ {pico:,.0f} ({mes_pico})"
-        )
 
-        self.fig.canvas.mpl_connect('pick_event', self.on_point_click)
+    def _on_scroll_legenda(self, event):
+        legend = self.ax.get_legend()
+        if legend is None or len(getattr(self, 'series_plotadas', [])) <= self.LEGENDA_POR_PAGINA:
+            return
+        if not legend.contains(event)[0]:
+            return
+        self._pagina_legenda += 1 if event.button == 'down' else -1
+        self._desenhar_legenda()
         self.redraw()
 
-
     # ==========================================================
     # 🔵 Clique nas bolinhas: destacar e mostrar valores
     # ==========================================================
-    def on_point_click(self, event):
-        artist = event.artist
+    def _preparar_destaque(self):
+        """Artistas do destaque, recriados após cada `ax.clear()`.
+
+        São `animated`: ficam fora do desenho completo (e portanto do fundo em
+        cache) e só aparecem via blit. O véu branco sobre os eixos faz o papel
+        de apagar as demais séries sem ter de alterar e redesenhar cada uma.
+        """
+        ax = self.ax
+        self._veu = ax.add_artist(Rectangle(
+            (0, 0), 1, 1, transform=ax.transAxes, facecolor='white', edgecolor='none',
+            alpha=0.65, zorder=5, animated=True, visible=False
+        ))
+        self._linha_destaque, = ax.plot([], [], linestyle='-', linewidth=3.5, zorder=6, animated=True, visible=False)
+        self._pontos_destaque = ax.scatter([], [], s=200, edgecolor='black', zorder=7, animated=True, visible=False)
+        self.cliente_texto = ax.text(
+            0.5, 1.01, '',
+            transform=ax.transAxes,
+            ha='center',
+            va='bottom',
+            fontsize=10,
+            fontweight='bold',
+            color='navy',
+            animated=True,
+            visible=False
+        )
+        self.text_labels = []
+        self._destaque_ativo = False
+        self._dica = ax.annotate(
+            '', xy=(0, 0), xytext=(12, 12), textcoords='offset points',
+            fontsize=9, zorder=9, animated=True, visible=False,
+            bbox=dict(boxstyle='round,pad=0.4', facecolor='lightyellow', edgecolor='gray', alpha=0.95)
+        )
+        self._ponto_dica = None
+        self._indice_pontos = None
+
+    def _artistas_destaque(self):
+        return [self._veu, self._linha_destaque, self._pontos_destaque, self.cliente_texto] + self.text_labels
+
+    def _desenhar_camadas(self):
+        """Desenha o destaque sobre o fundo, guarda esse estado para o hover e desenha a dica por cima"""
+        self._fundo_destaque = None
+        if self._destaque_ativo:
+            for artista in self._artistas_destaque():
+                self.ax.draw_artist(artista)
+            self._fundo_destaque = self.canvas.copy_from_bbox(self.fig.bbox)
+        if self._dica.get_visible():
+            self.ax.draw_artist(self._dica)
+
+    def _on_draw(self, event):
+        """Após cada desenho completo (filtro, zoom, resize): guardar o fundo, reindexar os pontos e repor o destaque"""
+        self._fundo = self.canvas.copy_from_bbox(self.fig.bbox)
+        self._indexar_pontos()
+        if self._destaque_ativo and self._rotulos_tela != self._estado_tela():
+            self._rotular_destaque()
+        self._desenhar_camadas()
+        interacao = getattr(self, '_interacao_pendente', None)
+        if interacao is not None and 'pedido_render' in interacao:
+            self._interacao_pendente = None
+            interacao['partes']['render'] = (time.perf_counter() - interacao['pedido_render']) * 1000
+            self._concluir_interacao(interacao)
+
+    def _blit_destaque(self):
+        if self._fundo is None:
+            self.redraw()
+            return
+        self.canvas.restore_region(self._fundo)
+        self._desenhar_camadas()
+        self.canvas.blit(self.fig.bbox)
+
+    def _blit_dica(self):
+        """Hover: repõe o fundo já com o destaque e redesenha só a dica"""
+        fundo = self._fundo_destaque if self._destaque_ativo else self._fundo
+        if fundo is None:
+            self._blit_destaque()
+            return
+        self.canvas.restore_region(fundo)
+        if self._dica.get_visible():
+            self.ax.draw_artist(self._dica)
+        self.canvas.blit(self.fig.bbox)
+
+    # ==========================================================
+    # 🧭 Ponto sob o mouse: índice em pixels, clique e dica
+    # ==========================================================
+    def _indexar_pontos(self):
+        """Posições em pixels das bolinhas visíveis, indexadas numa grade (uma vez por desenho).
+
+        Clique e dica consultam só a grade, sem `contains` nos artistas; o
+        índice é refeito em todo desenho completo, pois zoom, pan e resize
+        mudam as posições na tela.
+        """
+        self._indice_pontos = None
+        if getattr(self, '_pontos_series', None) is None:
+            return
+        xy = self.ax.transData.transform(self._pontos_series.get_offsets())
+        raio = self.RAIO_TOQUE_PT * self.fig.dpi / 72
+        x0, y0, x1, y1 = self.ax.bbox.extents
+        dentro = (xy[:, 0] >= x0 - raio) & (xy[:, 0] <= x1 + raio) & (xy[:, 1] >= y0 - raio) & (xy[:, 1] <= y1 + raio)
+        self._posicoes_indexadas = np.flatnonzero(dentro)
+        self._indice_pontos = IndicePontos(xy[dentro], raio)
+
+    def _ponto_sob_mouse(self, event):
+        """Índice (no scatter) da bolinha mais próxima do mouse, ou None"""
+        if self._indice_pontos is None or event.inaxes is not self.ax or event.x is None:
+            return None
+        i = self._indice_pontos.mais_proximo(event.x, event.y)
+        return None if i is None else int(self._posicoes_indexadas[i])
+
+    def _modo_navegacao(self):
+        # Com zoom ou pan da toolbar ativos, clique e arraste são da navegação
+        toolbar = getattr(self, 'toolbar', None)
+        return bool(toolbar is not None and toolbar.mode)
+
+    def _on_mover(self, event):
+        """Movimento do mouse: guarda o último evento e processa no máximo um a cada HOVER_INTERVALO_MS"""
+        self._hover_evento = event
+        if self._hover_agendado is not None:
+            return
+        root = getattr(self, 'root', None)
+        if root is None:
+            self._processar_hover()
+            return
+        self._hover_agendado = root.after(self.HOVER_INTERVALO_MS, self._processar_hover)
 
-        # Remover textos antigos (valores e nome de cliente)
-        for txt in getattr(self, "text_labels", []):
+    def _processar_hover(self):
+        self._hover_agendado = None
+        event, self._hover_evento = self._hover_evento, None
+        if event is None or self._fundo is None:
+            return
+        ponto = None if self._modo_navegacao() or event.button is not None else self._ponto_sob_mouse(event)
+        if ponto == self._ponto_dica:
+            return
+        self._ponto_dica = ponto
+        if ponto is None:
+            self._dica.set_visible(False)
+        else:
+            self._mostrar_dica(ponto)
+        self._blit_dica()
+
+    def _mostrar_dica(self, ponto):
+        """Dica com cliente, CNPJ, período e valor do ponto (só o texto e a posição da anotação mudam)"""
+        cliente, _ = self.series_plotadas[self._serie_do_ponto[ponto]]
+        x, y = self._pontos_series.get_offsets()[ponto]
+
+        linhas = [cliente]
+        cnpjs = self.cnpjs_do_cliente(cliente)
+        if cnpjs:
+            extra = f" (+{len(cnpjs) - 1})" if len(cnpjs) > 1 else ""
+            linhas.append(f"CNPJ: {cnpjs[0]}{extra}")
+        periodo = self.rotulo_periodo(x, self._granularidade)
+        linhas += [f"{self.NOME_PERIODO[self._granularidade]}: {periodo}", f"Valor: R$ {y:,.0f}"]
+
+        # Perto da borda direita a caixa abre para a esquerda
+        x_tela = self.ax.transData.transform((x, y))[0]
+        esquerda = x_tela > self.ax.bbox.x0 + self.ax.bbox.width * 0.6
+        self._dica.xy = (x, y)
+        self._dica.set_text("\n".join(linhas))
+        self._dica.set_position((-12, 12) if esquerda else (12, 12))
+        self._dica.set_horizontalalignment('right' if esquerda else 'left')
+        self._dica.set_visible(True)
+
+    def on_point_click(self, event):
+        if self._modo_navegacao():
+            self._arrastando = self.toolbar.mode == 'pan/zoom' and event.inaxes is self.ax
+            return
+        if event.button != 1:
+            return
+        ponto = self._ponto_sob_mouse(event)
+        if ponto is None:
+            return
+        self._destacar_ponto(ponto)
+
+    def _destacar_ponto(self, ponto):
+        interacao = self._iniciar_interacao('clique')
+        cliente = self._montar_destaque(self._serie_do_ponto[ponto])
+        inicio_blit = time.perf_counter()
+        interacao['partes']['destaque'] = (inicio_blit - interacao['inicio']) * 1000
+        self._blit_destaque()
+        interacao['partes']['blit'] = (time.perf_counter() - inicio_blit) * 1000
+        interacao['campos']['cliente'] = cliente
+        self._concluir_interacao(interacao)
+
+    def _montar_destaque(self, serie):
+        """Preparar os artistas do destaque para a série `serie` no nível desenhado; devolve o cliente"""
+        self._serie_destacada = serie
+        cliente, resumo = self.series_plotadas[serie]
+        cor = self._cores_series[serie]
+
+        # Destacar o cliente clicado
+        xs = resumo['x']
+        ys = resumo['valor']
+        self._linha_destaque.set_data(xs, ys)
+        self._linha_destaque.set_color(cor)
+        self._pontos_destaque.set_offsets(np.column_stack([xs, ys]))
+        self._pontos_destaque.set_facecolor(cor)
+        self._rotular_destaque()
+
+        # 🧾 Mostrar nome do cliente abaixo do título
+        self.cliente_texto.set_text(f"🔹 Cliente: {cliente}")
+
+        for artista in self._artistas_destaque():
+            artista.set_visible(True)
+        self._destaque_ativo = True
+        return cliente
+
+    def _estado_tela(self):
+        return tuple(self.ax.get_xlim()), tuple(self.ax.get_ylim()), tuple(self.ax.bbox.bounds)
+
+    def _rotular_destaque(self):
+        """💰 Valores sobre os pontos visíveis da série destacada, só os que cabem lado a lado (picos primeiro).
+
+        Cada Text custa alguns milissegundos no blit; rótulos encavalados não se
+        leem, então só entram os que não se sobrepõem. Zoom, pan e resize
+        refazem os rótulos (ver `_on_draw`).
+        """
+        # Por serem animated os textos antigos não estão no fundo; basta removê-los
+        for txt in self.text_labels:
             txt.remove()
         self.text_labels = []
-
-        if hasattr(self, "cliente_texto") and self.cliente_texto:
-            self.cliente_texto.remove()
-            self.cliente_texto = None
-
-        for pontos, linha, cliente, resumo in self.scatter_data:
-            if artist == pontos:
-                # Apagar destaques anteriores
-                for p, l, _, _ in self.scatter_data:
-                    l.set_linewidth(2)
-                    l.set_alpha(0.3)
-                    p.set_sizes([100])
-                    p.set_alpha(0.3)
-
-                # Destacar o cliente clicado
-                linha.set_linewidth(3.5)
-                linha.set_alpha(1)
-                pontos.set_sizes([200])
-                pontos.set_alpha(1)
-
-                # 💰 Mostrar os valores em cada ponto
-                for x, y in zip(resumo['anomes'], resumo['valor']):
-                    self.text_labels.append(
-                        self.ax.text(
-                            x, y,
-                            f"R$ {y:,.0f}",
-                            ha='center',
-                            va='bottom',
-                            fontsize=8,
-                            color='black',
-                            fontweight='bold',
-                            rotation=45
-                        )
-                    )
-
-                # 🧾 Mostrar nome do cliente abaixo do título
-                self.cliente_texto = self.ax.text(
-                    0.5, 1.01,
-                    f"🔹 Cliente: {cliente}",
-                    transform=self.ax.transAxes,
+        _, resumo = self.series_plotadas[self._serie_destacada]
+        xs, ys = resumo['x'], resumo['valor']
+        tela = self.ax.transData.transform(np.column_stack([xs, ys]))
+        x0, y0, x1, y1 = self.ax.bbox.extents
+        visiveis = np.flatnonzero((tela[:, 0] >= x0) & (tela[:, 0] <= x1) & (tela[:, 1] >= y0) & (tela[:, 1] <= y1))
+
+        largura_letra = self.ROTULO_FONTE * 0.62 * self.fig.dpi / 72
+        ocupados = []
+        for i in visiveis[np.argsort(-ys[visiveis], kind='stable')]:
+            texto = f"R$ {ys[i]:,.0f}"
+            meia = len(texto) * largura_letra / 2 + 2
+            esquerda, direita = tela[i, 0] - meia, tela[i, 0] + meia
+            if any(esquerda < d and direita > e for e, d in ocupados):
+                continue
+            ocupados.append((esquerda, direita))
+            self.text_labels.append(
+                self.ax.text(
+                    xs[i], ys[i],
+                    texto,
                     ha='center',
                     va='bottom',
-                    fontsize=10,
+                    fontsize=self.ROTULO_FONTE,
+                    color='black',
                     fontweight='bold',
-                    color='navy'
+                    zorder=8,
+                    animated=True
                 )
-
-                self.redraw()
-                break
-
-
-
+            )
+        self._rotulos_tela = self._estado_tela()
 
     def redraw(self):
-        if hasattr(self, 'canvas'):
-            self.canvas.get_tk_widget().destroy()
-        self.canvas = FigureCanvasTkAgg(self.fig, master=self.plot_frame)
-        self.canvas.draw()
-        self.canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+        interacao = getattr(self, '_interacao_pendente', None)
+        if interacao is not None and 'pedido_render' not in interacao:
+            interacao['pedido_render'] = time.perf_counter()
+            interacao['partes']['desenhar'] = (interacao['pedido_render'] - interacao['inicio_desenho']) * 1000
+        if self.medidor.perfil:
+            # Com perfil ligado o desenho é feito na hora, para entrar no cProfile
+            with self.medidor.etapa('redraw'):
+                self.canvas.draw()
+            return
+        self.canvas.draw_idle()
 
-        if hasattr(self, 'toolbar'):
-            self.toolbar.destroy()
-        self.toolbar = NavigationToolbar2Tk(self.canvas, self.plot_frame)
-        self.toolbar.update()
+    # ==========================================================
+    # ⏱️ Latência das interações (log e barra de status)
+    # ==========================================================
+    def _iniciar_interacao(self, nome, **campos):
+        return {'nome': nome, 'inicio': time.perf_counter(), 'partes': {}, 'campos': campos}
+
+    def _calcular_interacao(self, filtros, interacao):
+        """calcular_visao medindo a espera na fila do trabalhador e o cálculo"""
+        inicio = time.perf_counter()
+        interacao['partes']['fila'] = (inicio - interacao['inicio']) * 1000
+        visao = self.calcular_visao(*filtros)
+        interacao['partes']['calcular'] = (time.perf_counter() - inicio) * 1000
+        return visao
+
+    def _concluir_interacao(self, interacao):
+        total = (time.perf_counter() - interacao['inicio']) * 1000
+        partes = {nome: round(ms, 1) for nome, ms in interacao['partes'].items()}
+        self.medidor.registrar('interacao', nome=interacao['nome'], ms=round(total, 1), partes=partes, **interacao['campos'])
+        if self.mostrar_latencia and getattr(self, 'status_var', None) is not None:
+            detalhe = ' + '.join(f"{nome} {ms:.0f}" for nome, ms in partes.items())
+            base = self._status_dados or f"{len(self.df):,} linhas carregadas."
+            self._mostrar_status(f"{base}   ⏱ {interacao['nome']}: {total:.0f} ms ({detalhe})")
 
     def save_plot(self):
         try:
             filename = "grafico_powerbi_python.png"
+            # O destaque ativo entra na imagem pelo draw_event (_on_draw)
             self.fig.savefig(filename, dpi=300, bbox_inches='tight')
+            # O savefig desenha em outra resolução; recapturar o fundo da tela
+            self.canvas.draw()
             messagebox.showinfo("Sucesso", f"Gráfico salvo como '{filename}'")
         except Exception as e:
             messagebox.showerror("Erro", f"Erro ao salvar gráfico: {str(e)}")
 
+def _preparar_arquivo(file_path, compacto=False):
+    """Ler e preparar um CSV num processo do pool (carga de vários arquivos)"""
+    dados = DadosBI(compacto=compacto)
+    inicio = time.perf_counter()
+    df, _ = dados._ler_e_preparar(file_path)
+    colunas = (dados._cabecalho_csv, dados._colunas_lidas)
+    return (df, dados.colunas_detectadas, dados.has_cnpj_data, time.perf_counter() - inicio, colunas,
+            dados.linhas_descartadas)
+
+
+# ==========================================================
+# 🖨️ Relatórios em lote (sem interface)
+# ==========================================================
+# Dados abertos uma vez por processo do pool, a partir do cubo mapeado em memória
+_DADOS_LOTE = None
+
+
+def _iniciar_processo_lote(pasta_cubo, top_clientes):
+    global _DADOS_LOTE
+    plt.switch_backend('Agg')
+    _DADOS_LOTE = DadosBI.abrir_cubo(pasta_cubo, top_clientes=top_clientes)
+
+
+def _nome_arquivo(texto):
+    texto = unicodedata.normalize('NFKD', str(texto))
+    texto = ''.join(ch for ch in texto if not unicodedata.combining(ch))
+    return re.sub(r'[^0-9A-Za-z]+', '_', texto).strip('_') or 'vazio'
+
+
+def _gerar_relatorio(tarefa, pasta_saida, formatos, dpi):
+    """Renderizar um relatório (imagens + CSV das séries) num processo do pool"""
+    dados = _DADOS_LOTE
+    # Relatório por CNPJ: só aquele CNPJ, não todos os que contêm os dígitos dele
+    visao = dados.calcular_visao(tarefa['ano'], tarefa['campanha'], tarefa['cnpj'], cnpj_exato=tarefa.get('cnpj_exato', False))
+    base = os.path.join(pasta_saida, tarefa['nome'])
+
+    fig = Figure(figsize=(14, 8))
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    series = visao['series']
+    if series:
+        dados.plotar_visao(ax, visao)
+        handles = [Line2D([], [], color=cor, marker='o', linewidth=2, markeredgecolor='black') for cor in visao['cores']]
+        ax.legend(
+            handles,
+            [cliente for cliente, _ in series],
+            title="Cliente",
+            bbox_to_anchor=(1.02, 1),
+            loc='upper left',
+            borderaxespad=0,
+            fontsize=9,
+            ncol=-(-len(series) // 30)
+        )
+        # Na janela essa linha mostra o cliente clicado; no relatório, as estatísticas
+        ax.text(0.5, 1.01, dados.texto_estatisticas(visao), transform=ax.transAxes,
+                ha='center', va='bottom', fontsize=10, fontweight='bold', color='navy')
+    else:
+        ax.text(0.5, 0.5, "Sem dados para exibir", ha='center', va='center', fontsize=14, color='gray')
+
+    arquivos = []
+    with dados.medidor.etapa('salvar_imagens', relatorio=tarefa['nome'], formatos=formatos):
+        for formato in formatos:
+            caminho = f"{base}.{formato}"
+            fig.savefig(caminho, dpi=dpi, bbox_inches='tight')
+            arquivos.append(caminho)
+
+    linhas = [
+        (cliente, mes, valor)
+        for cliente, resumo in series
+        for mes, valor in zip(resumo['anomes'], resumo['valor'])
+    ]
+    pd.DataFrame(linhas, columns=['cliente', 'anomes', 'valor']).to_csv(
+        f"{base}.csv", sep=';', decimal=',', index=False, encoding='utf-8-sig'
+    )
+    arquivos.append(f"{base}.csv")
+    return tarefa['nome'], len(series), arquivos
+
+
+def _tarefas_lote(dados, args):
+    """Lista de relatórios pedidos: filtros avulsos, todos os CNPJs e/ou todas as campanhas"""
+    tarefas = []
+    for filtro in args.filtro or []:
+        tarefa = {'ano': 'Todos', 'campanha': 'Todas', 'cnpj': ''}
+        # Campanhas podem ter vírgula: só separa antes de "chave="
+        for parte in re.split(r',(?=\s*(?:ano|campanha|cnpj)\s*=)', filtro):
+            chave, sep, valor = parte.partition('=')
+            chave = chave.strip().lower()
+            if not sep or chave not in tarefa:
+                raise ValueError(f"Filtro inválido: {filtro!r} (use ano=...,campanha=...,cnpj=...)")
+            tarefa[chave] = valor.strip()
+        if tarefa['cnpj'] and not DadosBI._only_digits(tarefa['cnpj']):
+            raise ValueError(f"Filtro de CNPJ sem dígitos: {filtro!r}")
+        partes = [f"{k}_{_nome_arquivo(tarefa[k])}" for k, todos in (('ano', 'Todos'), ('campanha', 'Todas'), ('cnpj', '')) if tarefa[k] != todos]
+        tarefa['nome'] = 'relatorio_' + ('_'.join(partes) or 'geral')
+        tarefas.append(tarefa)
+
+    if args.todos_cnpjs:
+        tarefas += [
+            {'nome': f"relatorio_cnpj_{digits}", 'ano': 'Todos', 'campanha': 'Todas', 'cnpj': digits, 'cnpj_exato': True}
+            for digits in dados.cnpj_label_map
+        ]
+    if args.todas_campanhas:
+        tarefas += [
+            {'nome': f"relatorio_campanha_{_nome_arquivo(campanha)}", 'ano': 'Todos', 'campanha': campanha, 'cnpj': ''}
+            for campanha in dados.available_campanhas
+        ]
+
+    # Nomes que colidem depois de simplificados ganham um sufixo
+    vistos = {}
+    for tarefa in tarefas:
+        n = vistos.get(tarefa['nome'], 0)
+        vistos[tarefa['nome']] = n + 1
+        if n:
+            tarefa['nome'] += f"_{n + 1}"
+    return tarefas
+
+
+def main_lote(args):
+    """Gerar relatórios sem Tk: carrega o CSV uma vez e renderiza em paralelo num pool de processos"""
+    arquivos = DadosBI.resolver_arquivos(args.arquivo)
+    if not arquivos:
+        print(f"Arquivo CSV não encontrado: {args.arquivo}", file=sys.stderr)
+        return 1
+    formatos = [f.strip().lower() for f in args.formatos.split(',') if f.strip()]
+    invalidos = set(formatos) - {'png', 'svg', 'pdf'}
+    if invalidos:
+        print(f"Formatos não suportados: {', '.join(sorted(invalidos))}", file=sys.stderr)
+        return 1
+
+    dados = DadosBI(top_clientes=args.top_clientes, compacto=args.compacto, relatorio_memoria=args.relatorio_memoria)
+    dados.load_data(arquivos, usar_cache=not args.sem_cache, recriar_cache=args.recriar_cache, processos=args.processos)
+    try:
+        tarefas = _tarefas_lote(dados, args)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+    if not tarefas:
+        print("Nenhum relatório pedido (use --filtro, --todos-cnpjs ou --todas-campanhas).", file=sys.stderr)
+        return 1
+
+    os.makedirs(args.lote, exist_ok=True)
+    falhas = 0
+    with tempfile.TemporaryDirectory(prefix='tabela_bi_cubo_') as pasta_cubo:
+        dados.salvar_cubo(pasta_cubo)
+        with ProcessPoolExecutor(
+            max_workers=args.processos,
+            initializer=_iniciar_processo_lote,
+            initargs=(pasta_cubo, args.top_clientes),
+        ) as pool:
+            futuros = {
+                pool.submit(_gerar_relatorio, tarefa, args.lote, formatos, args.dpi): tarefa['nome']
+                for tarefa in tarefas
+            }
+            for n, futuro in enumerate(as_completed(futuros), 1):
+                try:
+                    nome, n_series, _ = futuro.result()
+                    print(f"[{n}/{len(tarefas)}] {nome}: {n_series} séries")
+                except Exception as e:
+                    falhas += 1
+                    print(f"[{n}/{len(tarefas)}] {futuros[futuro]}: erro — {e}", file=sys.stderr)
+
+    print(f"{len(tarefas) - falhas} relatórios gerados em {args.lote}" + (f", {falhas} com erro." if falhas else "."))
+    return 1 if falhas else 0
+
+
+# ==========================================================
+# 🌐 Servidor de consultas (HTTP/JSON, só leitura)
+# ==========================================================
+class ServidorBI(ThreadingHTTPServer):
+    """Um DadosBI carregado uma vez e consultado por várias janelas; cada requisição roda na sua thread"""
+    daemon_threads = True
+
+    def __init__(self, endereco, dados):
+        super().__init__(endereco, _TratadorBI)
+        self.dados = dados
+
+
+class _TratadorBI(BaseHTTPRequestHandler):
+    """Rotas GET: /info, /clientes e /visao?ano=&campanha=&cnpj= (os filtros de `calcular_visao`)"""
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        params = {chave: valores[-1] for chave, valores in parse_qs(url.query).items()}
+        dados = self.server.dados
+        try:
+            with dados.medidor.etapa('requisicao', rota=url.path):
+                if url.path == '/info':
+                    corpo = dados.info_json()
+                elif url.path == '/clientes':
+                    corpo = dados.tabela_json()
+                elif url.path == '/visao':
+                    visao = dados.calcular_visao(params.get('ano', 'Todos'), params.get('campanha', 'Todas'), params.get('cnpj', ''))
+                    corpo = dados.visao_json(visao)
+                else:
+                    self._responder(404, {'erro': f"Rota desconhecida: {url.path}"})
+                    return
+        except ValueError as e:
+            self._responder(400, {'erro': f"Filtro inválido: {e}"})
+            return
+        except Exception as e:
+            self._responder(500, {'erro': str(e)})
+            return
+        self._responder(200, corpo)
+
+    def _responder(self, status, corpo):
+        dados = json.dumps(corpo, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(dados)))
+        self.end_headers()
+        self.wfile.write(dados)
+
+
+class ClienteBI:
+    """Acesso ao servidor de consultas; erros do servidor viram RuntimeError com a mensagem dele"""
+
+    def __init__(self, url, timeout=60):
+        self.url = (url if '://' in url else f"http://{url}").rstrip('/')
+        self.timeout = timeout
+
+    def obter(self, rota, **params):
+        endereco = f"{self.url}{rota}" + (f"?{urlencode(params)}" if params else "")
+        try:
+            with urlopen(endereco, timeout=self.timeout) as resposta:
+                return json.loads(resposta.read().decode('utf-8'))
+        except HTTPError as e:
+            try:
+                mensagem = json.loads(e.read().decode('utf-8'))['erro']
+            except Exception:
+                mensagem = e.reason
+            raise RuntimeError(f"Servidor respondeu {e.code}: {mensagem}") from None
+
+
+def _endereco_servidor(texto):
+    """'8765', ':8765' ou 'host:8765' -> (host, porta); sem host, só a máquina local"""
+    host, _, porta = texto.rpartition(':')
+    return host or '127.0.0.1', int(porta)
+
+
+def main_servidor(args):
+    """Carregar o CSV uma vez e atender as janelas abertas com --servidor"""
+    arquivos = DadosBI.resolver_arquivos(args.arquivo)
+    if not arquivos:
+        print(f"Arquivo CSV não encontrado: {args.arquivo}", file=sys.stderr)
+        return 1
+    try:
+        endereco = _endereco_servidor(args.servir)
+    except ValueError:
+        print(f"Endereço inválido: {args.servir!r} (use PORTA ou HOST:PORTA)", file=sys.stderr)
+        return 1
+
+    dados = DadosBI(top_clientes=args.top_clientes, compacto=args.compacto, relatorio_memoria=args.relatorio_memoria)
+    dados.load_data(arquivos, usar_cache=not args.sem_cache, recriar_cache=args.recriar_cache, processos=args.processos)
+    servidor = ServidorBI(endereco, dados)
+    host, porta = servidor.server_address[:2]
+    print(f"Servindo {len(dados.df):,} linhas em http://{host}:{porta} (Ctrl+C para encerrar)")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+    return 0
+
+
 def main():
-    root = tk.Tk()
     default_path = r"C:\Users\karen.takara\OneDrive - Essie Publicidade e Comunicacao Ltda\Documentos\bi\resultado_filtrado.csv"
 
-    if len(sys.argv) > 1:
-        source_file = sys.argv[1]
-    else:
-        source_file = default_path
+    parser = argparse.ArgumentParser(description="Power BI em Python - Relatório Interativo")
+    parser.add_argument('arquivo', nargs='?', default=default_path,
+                        help="CSV de origem (separado por ';'), pasta com CSVs ou padrão glob ('exports/*.csv')")
+    parser.add_argument('--sem-cache', action='store_true', help="ignorar o cache em disco e ler o CSV")
+    parser.add_argument('--recriar-cache', action='store_true', help="reprocessar o CSV e regravar o cache")
+    parser.add_argument('--top-clientes', type=int, default=PowerBIInterativo.TOP_CLIENTES_PADRAO, metavar='N',
+                        help="plotar só os N clientes de maior valor; os demais viram a série 'Outros' (0 = todos)")
+    parser.add_argument('--observar', type=float, nargs='?', const=5.0, default=None, metavar='SEGUNDOS',
+                        help="verificar linhas novas no CSV a cada SEGUNDOS (padrão: 5) e atualizar a tela")
+    parser.add_argument('--processos', type=int, default=None,
+                        help="processos em paralelo para ler vários CSVs e gerar relatórios (padrão: nº de CPUs)")
+    parser.add_argument('--compacto', action='store_true',
+                        help="ler só as colunas usadas e guardar texto repetido como categorias (menos memória)")
+    parser.add_argument('--relatorio-memoria', action='store_true',
+                        help="com --compacto, mostrar os bytes de cada coluna antes e depois")
+    parser.add_argument('--log-medicoes', nargs='?', const='-', default=None, metavar='ARQUIVO',
+                        help="registrar tempo e memória de cada etapa em JSON, uma linha por evento "
+                             "(em ARQUIVO ou no stderr; também via TABELA_BI_LOG)")
+    parser.add_argument('--perfil', metavar='PASTA',
+                        help="gravar cProfile e tracemalloc de cada etapa principal em PASTA (também via TABELA_BI_PERFIL)")
+    parser.add_argument('--latencia', action='store_true',
+                        help="mostrar na barra de status o tempo de cada parte da última interação")
+
+    lote = parser.add_argument_group("modo em lote (sem interface)")
+    lote.add_argument('--lote', metavar='PASTA', help="gerar relatórios em PASTA em vez de abrir a janela")
+    lote.add_argument('--filtro', action='append', metavar='FILTRO',
+                      help="relatório para 'ano=2024,campanha=Nome,cnpj=123' (pode repetir)")
+    lote.add_argument('--todos-cnpjs', action='store_true', help="um relatório por CNPJ")
+    lote.add_argument('--todas-campanhas', action='store_true', help="um relatório por campanha")
+    lote.add_argument('--formatos', default='png', help="formatos das imagens: png,svg,pdf (padrão: png)")
+    lote.add_argument('--dpi', type=int, default=300)
+
+    rede = parser.add_argument_group("servidor de consultas (um carregamento, várias janelas)")
+    rede.add_argument('--servir', metavar='[HOST:]PORTA',
+                      help="carregar o CSV e responder consultas por HTTP/JSON em vez de abrir a janela "
+                           "(sem HOST, só na máquina local)")
+    rede.add_argument('--servidor', metavar='URL',
+                      help="abrir a janela com os dados de um servidor (--servir) em vez de ler o CSV")
+    args = parser.parse_args()
+
+    # Pelo ambiente a configuração chega também aos processos do pool
+    if args.log_medicoes:
+        os.environ['TABELA_BI_LOG'] = os.path.abspath(args.log_medicoes) if args.log_medicoes != '-' else '-'
+    if args.perfil:
+        os.environ['TABELA_BI_PERFIL'] = os.path.abspath(args.perfil)
+
+    if args.lote:
+        return main_lote(args)
+    if args.servir:
+        return main_servidor(args)
 
-    if not os.path.exists(source_file):
-        messagebox.showerror("Erro", f"Arquivo CSV não encontrado:\n{source_file}")
+    root = tk.Tk()
+    if args.servidor:
+        PowerBIInterativo(root, servidor=args.servidor, mostrar_latencia=args.latencia)
+        root.mainloop()
         return
 
-    app = PowerBIInterativo(root, source_file=source_file)
+    arquivos = DadosBI.resolver_arquivos(args.arquivo)
+
+    if not arquivos:
+        messagebox.showerror("Erro", f"Arquivo CSV não encontrado:\n{args.arquivo}")
+        return
+    if len(arquivos) > 1 and args.observar:
+        print("--observar só funciona com um único CSV — ignorado.")
+        args.observar = None
+
+    app = PowerBIInterativo(
+        root,
+        source_file=arquivos[0] if len(arquivos) == 1 else arquivos,
+        processos=args.processos,
+        usar_cache=not args.sem_cache,
+        recriar_cache=args.recriar_cache,
+        top_clientes=args.top_clientes,
+        observar=args.observar,
+        compacto=args.compacto,
+        relatorio_memoria=args.relatorio_memoria,
+        mostrar_latencia=args.latencia,
+    )
     root.mainloop()
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,24 @@
+import os
+import sys
+
+import matplotlib
+import pytest
+
+matplotlib.use('Agg')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tabela_bi  # noqa: E402
+
+DADOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dados')
+
+
+def caminho(nome):
+    return os.path.join(DADOS, nome)
+
+
+@pytest.fixture
+def dados():
+    """DadosBI carregado do CSV de exemplo (sem cache em disco)"""
+    dados = tabela_bi.DadosBI(top_clientes=3)
+    dados.load_data(caminho('vendas_utf8.csv'), usar_cache=False)
+    return dados
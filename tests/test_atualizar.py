@@ -0,0 +1,81 @@
+import os
+import shutil
+
+import pytest
+
+from conftest import caminho
+from tabela_bi import DadosBI
+
+LINHA = '20/06/2024;R$ 100,00;Loja Nova;Verão;MG;22.333.444/0001-55;200;Rádio\n'
+
+
+def _copia(tmp_path):
+    destino = tmp_path / 'vendas.csv'
+    shutil.copy(caminho('vendas_utf8.csv'), destino)
+    return destino
+
+
+def test_linha_incompleta_no_fim_fica_para_a_proxima_leitura_se_observado(tmp_path):
+    arquivo = _copia(tmp_path)
+    completo = arquivo.read_bytes()
+    with open(arquivo, 'a', encoding='utf-8') as f:
+        f.write(LINHA[:25])
+
+    dados = DadosBI()
+    dados.observar = 5
+    dados.load_data(str(arquivo), usar_cache=False)
+    linhas = len(dados.df)
+    assert dados._arquivo_lido['offset'] == len(completo)
+    assert 'Loja Nova' not in set(dados.df['cliente'])
+
+    with open(arquivo, 'a', encoding='utf-8') as f:
+        f.write(LINHA[25:])
+    assert dados.atualizar_arquivo(str(arquivo), usar_cache=False) == ('anexado', 1)
+    assert len(dados.df) == linhas + 1
+    assert dados.df['valor'].iloc[-1] == 100.0
+
+
+def test_ultima_linha_sem_quebra_e_lida_e_gera_cache(tmp_path):
+    arquivo = _copia(tmp_path)
+    arquivo.write_bytes(arquivo.read_bytes().rstrip(b'\n'))
+
+    dados = DadosBI()
+    dados.load_data(str(arquivo), usar_cache=False)
+    assert len(dados.df) == 20
+    assert dados.df['valor'].iloc[-1] == -150.0
+    assert dados.verificar_arquivo(str(arquivo)) == 'igual'
+
+    pytest.importorskip('pyarrow')
+    DadosBI().load_data(str(arquivo))
+    assert all(os.path.exists(p) for p in DadosBI._cache_paths(str(arquivo)))
+
+
+def test_linhas_anexadas_durante_a_carga_nao_se_perdem(tmp_path, monkeypatch):
+    arquivo = _copia(tmp_path)
+    ler_csv = DadosBI._ler_csv
+
+    def ler_e_anexar(self, origem, encoding, read_kwargs):
+        with open(arquivo, 'a', encoding='utf-8') as f:
+            f.write(LINHA)
+        return ler_csv(self, origem, encoding, read_kwargs)
+
+    monkeypatch.setattr(DadosBI, '_ler_csv', ler_e_anexar)
+    dados = DadosBI()
+    dados.load_data(str(arquivo), usar_cache=False)
+    assert 'Loja Nova' not in set(dados.df['cliente'])
+
+    assert dados.atualizar_arquivo(str(arquivo), usar_cache=False) == ('anexado', 1)
+    assert (dados.df['cliente'] == 'Loja Nova').sum() == 1
+
+
+def test_compacto_anexa_linha_sem_os_campos_finais(tmp_path):
+    arquivo = _copia(tmp_path)
+    dados = DadosBI(compacto=True)
+    dados.load_data(str(arquivo), usar_cache=False)
+    linhas = len(dados.df)
+
+    with open(arquivo, 'a', encoding='utf-8') as f:
+        f.write('20/06/2024;R$ 100,00;Loja Nova;Verão;MG\n')
+    assert dados.atualizar_arquivo(str(arquivo), usar_cache=False) == ('anexado', 1)
+    assert len(dados.df) == linhas + 1
+    assert dados.df['cliente'].iloc[-1] == 'Loja Nova'
@@ -0,0 +1,39 @@
+import numpy as np
+import pandas as pd
+
+from tabela_bi import DadosBI
+
+
+def _mapeado(arr):
+    """O array é (uma visão de) um np.memmap?"""
+    while arr is not None:
+        if isinstance(arr, np.memmap):
+            return True
+        arr = getattr(arr, 'base', None)
+    return False
+
+
+def test_abrir_cubo_mantem_colunas_mapeadas(dados, tmp_path):
+    dados.salvar_cubo(str(tmp_path))
+    aberto = DadosBI.abrir_cubo(str(tmp_path), top_clientes=3)
+
+    for col in aberto.cubo.columns:
+        serie = aberto.cubo[col]
+        arr = serie.array.codes if isinstance(serie.dtype, pd.CategoricalDtype) else serie.to_numpy()
+        assert _mapeado(arr), col
+
+    visao = aberto.calcular_visao()
+    assert _mapeado(visao['selecao'].codigos('anomes'))
+
+
+def test_abrir_cubo_da_as_mesmas_visoes(dados, tmp_path):
+    dados.salvar_cubo(str(tmp_path))
+    aberto = DadosBI.abrir_cubo(str(tmp_path), top_clientes=3)
+
+    for filtros in [('Todos', 'Todas', ''), ('2023', 'Todas', ''), ('Todos', 'Inverno', ''), ('Todos', 'Todas', '0123')]:
+        esperado = dados.calcular_visao(*filtros)
+        obtido = aberto.calcular_visao(*filtros)
+        assert [c for c, _ in obtido['series']] == [c for c, _ in esperado['series']]
+        for (_, a), (_, b) in zip(obtido['series'], esperado['series']):
+            np.testing.assert_allclose(a['valor'], b['valor'])
+        assert obtido['estatisticas'] == esperado['estatisticas']
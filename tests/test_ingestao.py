@@ -0,0 +1,100 @@
+import re
+
+import pandas as pd
+import pytest
+
+from conftest import caminho
+from tabela_bi import DadosBI
+
+
+def _parse_valor(v):
+    """Conversão linha a linha anterior à leitura vetorizada (referência)"""
+    if pd.isna(v):
+        return 0.0
+    s = str(v).strip()
+    s = s.replace('r$', '').replace(' ', '').replace('.', '').replace(',', '.')
+    try:
+        return float(s)
+    except ValueError:
+        m = re.search(r'[-+]?\d+(\.\d+)?', s)
+        return float(m.group(0)) if m else 0.0
+
+
+def _carregar(nome, engine=None, monkeypatch=None):
+    if engine is not None:
+        monkeypatch.setattr(DadosBI, '_csv_engine', staticmethod(lambda: engine))
+    dados = DadosBI()
+    dados.load_data(caminho(nome), usar_cache=False)
+    return dados.df
+
+
+def test_utf8_e_latin1_dao_o_mesmo_dataframe():
+    pd.testing.assert_frame_equal(_carregar('vendas_utf8.csv'), _carregar('vendas_latin1.csv'))
+
+
+def test_leitores_c_e_pyarrow_dao_o_mesmo_dataframe(monkeypatch):
+    pytest.importorskip('pyarrow')
+    for nome in ('vendas_utf8.csv', 'vendas_latin1.csv'):
+        c = _carregar(nome, 'c', monkeypatch)
+        pd.testing.assert_frame_equal(_carregar(nome, 'pyarrow', monkeypatch), c)
+
+
+@pytest.mark.parametrize('nome, encoding', [('vendas_utf8.csv', 'utf-8'), ('vendas_latin1.csv', 'latin1')])
+def test_valor_e_cnpj_iguais_aos_da_conversao_linha_a_linha(nome, encoding):
+    df = _carregar(nome)
+    bruto = pd.read_csv(caminho(nome), sep=';', engine='python', dtype=str, encoding=encoding).loc[df.index]
+
+    pd.testing.assert_series_equal(df['valor'], bruto['Total Líquido'].apply(_parse_valor), check_names=False)
+    pd.testing.assert_series_equal(df['cnpj_digits'], bruto['CNPJ Cliente'].apply(DadosBI._only_digits),
+                                   check_names=False, check_dtype=False)
+    assert df.loc[18, 'valor'] == 15005.0  # '1500.5': o ponto é separador de milhar, como antes
+    assert df['estado_cliente'].tolist() == bruto['Estado Cliente'].fillna('').str.strip().str.upper().tolist()
+
+
+@pytest.mark.parametrize('texto', ['R$ 1.234.567,89', 'R$ -150,00', '-R$ 5,00', '1500.5', '12abc', 'abc', '', None,
+                                   'R$1,5', '  R$ 0,01  ', '1.2.3,4', '+7'])
+def test_parse_valores_casos_de_borda(texto):
+    obtido = DadosBI._parse_valores(pd.Series([texto], dtype=object))
+    assert obtido.iloc[0] == _parse_valor(texto)
+
+
+def _csv_sem_acentos_nas_pontas(tmp_path, meio, encoding):
+    """CSV com cabeçalho e linhas das pontas em ASCII; só o `meio` tem acentos (fora das amostras)"""
+    linha = '05/01/2022;R$ 10,00;Loja Simples;Verao;SP;11.111.111/0001-11;1;Radio\n'
+    texto = ('Data Emissao;Total Liquido;Cliente;Campanha;Estado Cliente;CNPJ Cliente;PI;Veiculo\n'
+             + linha * 200 + meio + linha * 200)
+    destino = tmp_path / 'meio.csv'
+    destino.write_bytes(texto.encode(encoding, errors='surrogateescape'))
+    return str(destino)
+
+
+@pytest.mark.parametrize('engine', ['c', 'pyarrow'])
+def test_latin1_com_acentos_so_no_meio(tmp_path, monkeypatch, engine):
+    if engine == 'pyarrow':
+        pytest.importorskip('pyarrow')
+    monkeypatch.setattr(DadosBI, 'AMOSTRA_ENCODING', 4096)
+    monkeypatch.setattr(DadosBI, '_csv_engine', staticmethod(lambda: engine))
+    meio = '10/01/2022;R$ 20,00;Padaria São João;Verão;SP;12.345.678/0001-90;2;Rádio\n' * 5
+    dados = DadosBI()
+    dados.load_data(_csv_sem_acentos_nas_pontas(tmp_path, meio, 'latin1'), usar_cache=False)
+
+    assert dados._encoding_csv == 'latin1'
+    assert (dados.df['cliente'] == 'Padaria São João').sum() == 5
+    assert not dados.df['cliente'].str.contains('�').any()
+
+
+@pytest.mark.parametrize('engine', ['c', 'pyarrow'])
+def test_utf8_com_um_byte_invalido_no_meio(tmp_path, monkeypatch, engine):
+    if engine == 'pyarrow':
+        pytest.importorskip('pyarrow')
+    monkeypatch.setattr(DadosBI, 'AMOSTRA_ENCODING', 4096)
+    monkeypatch.setattr(DadosBI, '_csv_engine', staticmethod(lambda: engine))
+    # '\udce9' vira o byte 0xE9 sozinho (um 'é' em Latin-1 perdido no meio do UTF-8)
+    meio = ('10/01/2022;R$ 20,00;Padaria São João;Verão;SP;12.345.678/0001-90;2;Rádio\n' * 5
+            + '11/01/2022;R$ 30,00;Caf\udce9 Central;Verão;SP;22.222.222/0001-22;3;TV\n')
+    dados = DadosBI()
+    dados.load_data(_csv_sem_acentos_nas_pontas(tmp_path, meio, 'utf-8'), usar_cache=False)
+
+    assert dados._encoding_csv == 'utf-8'
+    assert (dados.df['cliente'] == 'Padaria São João').sum() == 5
+    assert (dados.df['cliente'] == 'Caf� Central').sum() == 1
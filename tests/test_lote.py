@@ -0,0 +1,41 @@
+from types import SimpleNamespace
+
+from tabela_bi import DadosBI, _tarefas_lote
+
+CSV = """Data Emissão;Total Líquido;Cliente;Campanha;Estado Cliente;CNPJ Cliente
+05/01/2022;R$ 100,00;Cliente A;Verão;SP;12.345.678/0001-90
+06/01/2022;R$ 200,00;Cliente B;Verão;RJ;345678000
+07/02/2022;R$ 300,00;Cliente C;Inverno;MG;98.765.432/0001-10
+"""
+
+
+def _dados(tmp_path):
+    arquivo = tmp_path / 'cnpjs.csv'
+    arquivo.write_text(CSV, encoding='utf-8')
+    dados = DadosBI()
+    dados.load_data(str(arquivo), usar_cache=False)
+    return dados
+
+
+def test_relatorio_por_cnpj_pega_so_o_cnpj_exato(tmp_path):
+    dados = _dados(tmp_path)
+    # A busca da caixa de texto continua por trecho (e vem antes, para usar o cache de visões)
+    busca = dados.calcular_visao('Todos', 'Todas', '345678000')
+    assert sorted(busca['cnpjs_encontrados']) == ['12345678000190', '345678000']
+
+    visao = dados.calcular_visao('Todos', 'Todas', '345678000', cnpj_exato=True)
+    assert visao['cnpjs_encontrados'] == ['345678000']
+    assert [cliente for cliente, _ in visao['series']] == ['Cliente B - RJ']
+    assert visao['estatisticas'][0] == 200.0
+
+    assert dados.calcular_visao('Todos', 'Todas', '3456', cnpj_exato=True)['series'] == []
+
+
+def test_tarefas_de_todos_os_cnpjs_pedem_busca_exata(tmp_path):
+    dados = _dados(tmp_path)
+    args = SimpleNamespace(filtro=['cnpj=3456'], todos_cnpjs=True, todas_campanhas=False)
+    tarefas = {t['nome']: t for t in _tarefas_lote(dados, args)}
+
+    assert not tarefas['relatorio_cnpj_3456'].get('cnpj_exato')
+    for digits in dados.cnpj_label_map:
+        assert tarefas[f"relatorio_cnpj_{digits}"]['cnpj_exato']
@@ -0,0 +1,55 @@
+import threading
+
+import numpy as np
+import pytest
+
+from tabela_bi import ClienteBI, ServidorBI
+
+
+@pytest.fixture
+def cliente(dados):
+    servidor = ServidorBI(('127.0.0.1', 0), dados)
+    thread = threading.Thread(target=servidor.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    yield ClienteBI(f"127.0.0.1:{servidor.server_address[1]}", timeout=10)
+    servidor.shutdown()
+    servidor.server_close()
+    thread.join()
+
+
+@pytest.mark.parametrize('ano, campanha, cnpj', [
+    ('Todos', 'Todas', ''),
+    ('2023', 'Todas', ''),
+    ('Todos', 'Páscoa', ''),
+    ('Todos', 'Todas', '12.345'),
+    ('Todos', 'Todas', '99999999'),
+])
+def test_visao_do_servidor_igual_a_calcular_visao(dados, cliente, ano, campanha, cnpj):
+    esperada = dados.calcular_visao(ano, campanha, cnpj)
+    corpo = cliente.obter('/visao', ano=ano, campanha=campanha, cnpj=cnpj)
+    visao = dados.visao_de_json(corpo)
+
+    assert visao['busca_cnpj'] == esperada['busca_cnpj']
+    assert visao['cnpjs_encontrados'] == [str(c) for c in esperada['cnpjs_encontrados']]
+    chaves = dados.chaves_da_selecao(esperada['selecao'])
+    assert visao['chaves_selecao'] == (None if chaves is None else [str(c) for c in chaves])
+    assert [c for c, _ in visao['series']] == [c for c, _ in esperada['series']]
+    for (_, obtido), (_, resumo) in zip(visao['series'], esperada['series']):
+        assert list(obtido['anomes']) == [str(m) for m in resumo['anomes']]
+        np.testing.assert_allclose(obtido['valor'], resumo['valor'])
+    if esperada['series']:
+        assert visao['pis_recor'] == esperada['pis_recor']
+        np.testing.assert_allclose(visao['estatisticas'][:3], esperada['estatisticas'][:3])
+        assert visao['estatisticas'][3] == str(esperada['estatisticas'][3])
+        for nivel, lista in esperada['niveis'].items():
+            assert len(visao['niveis'][nivel]) == len(lista)
+            for (_, obtido), (_, resumo) in zip(visao['niveis'][nivel], lista):
+                np.testing.assert_allclose(obtido['x'], resumo['x'])
+                np.testing.assert_allclose(obtido['valor'], resumo['valor'])
+
+
+def test_servidor_responde_erros_em_json(cliente):
+    with pytest.raises(RuntimeError, match='400'):
+        cliente.obter('/visao', ano='xx')
+    with pytest.raises(RuntimeError, match='404'):
+        cliente.obter('/nada')
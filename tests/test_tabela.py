@@ -0,0 +1,41 @@
+import numpy as np
+
+from conftest import caminho
+from tabela_bi import DadosBI
+
+
+def _sem_cnpj(tmp_path):
+    """Cópia do CSV de exemplo sem a coluna de CNPJ"""
+    linhas = open(caminho('vendas_utf8.csv'), encoding='utf-8').read().splitlines()
+    destino = tmp_path / 'sem_cnpj.csv'
+    destino.write_text('\n'.join(';'.join(l.split(';')[:5] + l.split(';')[6:]) for l in linhas) + '\n', encoding='utf-8')
+    dados = DadosBI(top_clientes=3)
+    dados.load_data(str(destino), usar_cache=False)
+    return dados
+
+
+def test_tabela_sem_cnpj_totaliza_por_cliente(tmp_path):
+    dados = _sem_cnpj(tmp_path)
+    chaves, digits, clientes, estados, totais = dados.linhas_tabela()
+
+    assert (digits == '').all()
+    assert len(set(chaves)) == len(chaves) == dados.df['cliente_label'].nunique()
+    esperado = dados.df.groupby('cliente_label')['valor'].sum()
+    np.testing.assert_allclose(totais, esperado.reindex(chaves).to_numpy())
+    assert totais.sum() < len(chaves) * totais.max()
+
+
+def test_selecao_sem_cnpj_filtra_so_os_clientes_da_visao(tmp_path):
+    dados = _sem_cnpj(tmp_path)
+    visao = dados.calcular_visao('Todos', 'Páscoa', '')
+    chaves = dados.chaves_da_selecao(visao['selecao'])
+
+    esperado = dados.df.loc[dados.df['campanha'] == 'Páscoa', 'cliente_label'].unique()
+    assert sorted(chaves) == sorted(esperado)
+    assert len(chaves) < len(dados.linhas_tabela()[0])
+
+
+def test_tabela_com_cnpj_usa_o_cnpj_como_chave(dados):
+    chaves, digits, *_ = dados.linhas_tabela()
+    assert list(chaves) == list(digits)
+    assert '' not in set(dados.chaves_da_selecao(dados.calcular_visao('2023', 'Todas', '')['selecao']))
@@ -0,0 +1,44 @@
+import threading
+
+from tabela_bi import Trabalhador
+
+
+class RaizFalsa:
+    """Só o que o Trabalhador usa do Tk: after() guardado para rodar à mão"""
+
+    def __init__(self):
+        self.agendados = []
+        self.erros = []
+
+    def after(self, _ms, funcao):
+        self.agendados.append(funcao)
+
+    def report_callback_exception(self, tipo, valor, _tb):
+        self.erros.append(valor)
+
+    def rodar_agendados(self):
+        agendados, self.agendados = self.agendados, []
+        for funcao in agendados:
+            funcao()
+
+
+def test_callback_com_erro_nao_para_a_entrega():
+    raiz = RaizFalsa()
+    trabalhador = Trabalhador(raiz)
+    recebidos = []
+
+    def falhar(_):
+        raise RuntimeError("erro no callback")
+
+    trabalhador.notificar(falhar, None)
+    trabalhador.notificar(recebidos.append, 1)
+    raiz.rodar_agendados()
+    assert [str(e) for e in raiz.erros] == ["erro no callback"]
+    assert recebidos == [1]
+
+    # O laço continua agendado: resultados de tarefas posteriores ainda chegam
+    pronto = threading.Event()
+    trabalhador.submeter(lambda: 2, lambda v: (recebidos.append(v), pronto.set())).result()
+    raiz.rodar_agendados()
+    assert pronto.is_set() and recebidos == [1, 2]
+    trabalhador.encerrar()